@@ -0,0 +1,46 @@
+# Measures how long the member index takes to build and to answer the
+# searches typed into the member selector, for generated rosters.
+#
+#   python benchmarks/bench_member_search.py [--sizes 30000 100000]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from member_index import MemberIndex
+from roster_import import Roster
+
+LAST_NAMES = ["SMITH", "JOHNSON", "O'BRIEN", "GARCIA", "NGUYEN", "MILLER", "DAVIS", "VAN DER BERG", "WILSON", "MARTINEZ"]
+FIRST_NAMES = ["JOHN", "MARY", "JOSE", "ANNE", "WEI", "LUIS", "PATRICIA", "ROBERT"]
+# A user typing "smith jo", then looking someone up by Employee ID, with and without the N
+QUERIES = ["s", "sm", "smi", "smit", "smith", "smith j", "smith jo", "n0001", "n000123", "123", "12345", "zz"]
+
+def make_roster(count):
+    rng = np.random.default_rng(902)
+    last = np.array(LAST_NAMES)[rng.integers(0, len(LAST_NAMES), count)]
+    first = np.array(FIRST_NAMES)[rng.integers(0, len(FIRST_NAMES), count)]
+    suffix = rng.integers(0, 10 ** 6, count).astype(str)
+    names = np.char.add(np.char.add(np.char.add(last, ", "), first), np.char.add(" ", suffix))
+    ids = np.char.add("N", np.char.zfill(np.arange(count).astype(str), 8))
+    return Roster({"Name": names, "Employee ID": ids})
+
+def main():
+    parser = argparse.ArgumentParser(description="Member search benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[30000, 100000])
+    args = parser.parse_args()
+
+    for count in args.sizes:
+        roster = make_roster(count)
+        start = time.perf_counter()
+        index = MemberIndex(roster)
+        print(f"{count:,} members: index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+        for query in QUERIES:
+            start = time.perf_counter()
+            matches = index.search(query)
+            print(f"  {query!r:<12}{len(matches):>9,} matches{(time.perf_counter() - start) * 1000:>9.2f} ms")
+
+if __name__ == "__main__":
+    main()
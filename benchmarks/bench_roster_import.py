@@ -0,0 +1,84 @@
+# Measures how long a member roster takes to load with the streaming
+# read-only importer, compared with the full workbook load modify_member
+# used before and with a repeat import served from the roster cache, for
+# generated rosters of several sizes.
+#
+#   python benchmarks/bench_roster_import.py [--sizes 10000 100000] [--legacy-limit 100000] [--memory]
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from roster_cache import RosterCache
+from roster_import import load_roster
+
+HEADERS = ["Agency Code", "Name", "Title", "Department", "Hire Date", "Member ID", "Address", "City", "State", "Zip", "Phone", "Email"]
+
+def write_roster(file_path, count):
+    # openpyxl writes inline strings where Excel writes a shared string table;
+    # the importer reads both
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADERS)
+    hired = datetime.datetime(2015, 3, 1)
+    for row in range(count):
+        sheet.append([
+            "05527" if row % 2 else "05007", f"MEMBER, NUMBER {row}", "CLERK", "HIGHWAY", hired,
+            f"N{row:08d}", f"{row} MAIN ST", "SCHENECTADY", "NY", 12305, "518-555-0100", f"member{row}@example.com",
+        ])
+    workbook.save(file_path)
+
+def load_roster_legacy(file_path):
+    # What modify_member did before the streaming importer
+    wb = load_workbook(file_path)
+    sheet = wb.active
+    member_data = []
+    for row in sheet.iter_rows(values_only=True):
+        member_data.append(row)
+    return pd.DataFrame(member_data[1:], columns=member_data[0])
+
+def measure(function, file_path, memory):
+    start = time.perf_counter()
+    rows = len(function(file_path))
+    seconds = time.perf_counter() - start
+    if not memory:
+        return seconds, None, rows
+    # tracemalloc slows allocation down a lot, so memory is measured on a second run
+    tracemalloc.start()
+    function(file_path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Member roster import benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--legacy-limit", type=int, default=100000, help="largest roster to run the full workbook load for")
+    parser.add_argument("--memory", action="store_true", help="also measure peak memory (runs each import twice)")
+    args = parser.parse_args()
+
+    print(f"{'importer':<22}{'rows':>10}{'seconds':>10}{'peak MB':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.sizes:
+            file_path = os.path.join(directory, f"roster{count}.xlsx")
+            write_roster(file_path, count)
+            cache = RosterCache(os.path.join(directory, "cache"))
+            # Fill the cache, as the first import of a roster does
+            cache.load_roster(file_path)
+            variants = [("streaming importer", load_roster), ("cached roster", lambda path: cache.load_roster(path)[0])]
+            if count <= args.legacy_limit:
+                variants.append(("full workbook load", load_roster_legacy))
+            for label, function in variants:
+                seconds, peak, rows = measure(function, file_path, args.memory)
+                peak = f"{peak / (1024 * 1024):>10.1f}" if peak is not None else f"{'-':>10}"
+                print(f"{label:<22}{rows:>10,}{seconds:>10.2f}{peak}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Measures how fast NBEN902 files are written by the bulk serializer in
+# file_operations, compared with the previous row-by-row writer.
+#
+#   python benchmarks/bench_save_data.py [--sizes 10000 100000 1000000] [--legacy-limit 100000]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from file_operations import COLUMN_NAMES, COL_WIDTHS, save_columns, save_data
+
+def make_columns(count):
+    rng = np.random.default_rng(902)
+    ids = rng.integers(0, 10 ** 8, count)
+    return [
+        np.where(rng.random(count) < 0.5, "05527", "05007"),
+        np.char.add("MEMBER, NUMBER ", ids.astype(str)),
+        np.char.add("N", np.char.zfill(ids.astype(str), 8)),
+        np.where(rng.random(count) < 0.5, "407", "456"),
+        np.full(count, "01-02-2025"),
+        np.where(rng.random(count) < 0.9, "", "12-31-2025"),
+        rng.integers(1, 10000, count).astype(str),
+    ]
+
+def save_data_row_by_row(df, file_path):
+    # The writer save_data used before it was vectorized
+    with open(file_path, "w") as file:
+        for _, row in df.iterrows():
+            row_str = ""
+            for idx, value in enumerate(row):
+                if idx == 4 or idx == 5:
+                    if value == "":
+                        value = " " * COL_WIDTHS[idx]
+                if idx == 6:
+                    formatted_value = str(value).rjust(COL_WIDTHS[idx], '0')
+                else:
+                    formatted_value = str(value).ljust(COL_WIDTHS[idx], ' ')
+                row_str += formatted_value[:COL_WIDTHS[idx]]
+            file.write(row_str + "\n")
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+def report(label, count, seconds, file_path):
+    size = os.path.getsize(file_path) / (1024 * 1024)
+    print(f"{label:<22}{count:>10,}{seconds:>10.3f}s{count / seconds:>14,.0f} rec/s{size / seconds:>10.1f} MB/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--legacy-limit", type=int, default=100000, help="largest size to run the row-by-row writer for")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, "paysrp.nben902.sccea.input")
+        for count in args.sizes:
+            columns = make_columns(count)
+            df = pd.DataFrame(dict(zip(COLUMN_NAMES, columns)), columns=COLUMN_NAMES)
+
+            report("save_columns", count, timed(save_columns, columns, file_path), file_path)
+            report("save_data (DataFrame)", count, timed(save_data, df, file_path), file_path)
+            if count <= args.legacy_limit:
+                report("row by row (old)", count, timed(save_data_row_by_row, df, file_path), file_path)
+
+if __name__ == "__main__":
+    main()
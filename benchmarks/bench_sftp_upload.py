@@ -0,0 +1,70 @@
+# Measures SFTP upload throughput against the local stand-in server for a
+# range of file sizes and simulated round-trip times, comparing paramiko's
+# default put() with sftp_client.upload_file at several request sizes.
+#
+#   python benchmarks/bench_sftp_upload.py [--sizes-mb 1 10 50] [--rtts 0 0.02 0.1]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import paramiko
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+from sftp_client import SFTPSession, upload_file
+from sftp_test_server import USERNAME, PASSWORD, start_server_process
+
+def paramiko_defaults(port):
+    transport = paramiko.Transport(("127.0.0.1", port))
+    transport.connect(username=USERNAME, password=PASSWORD)
+    return transport, paramiko.SFTPClient.from_transport(transport)
+
+def tuned(port):
+    session = SFTPSession("127.0.0.1", port, USERNAME, PASSWORD)
+    session.connect()
+    return session.transport, session.sftp
+
+def measure(connect, port, upload, local_path):
+    transport, sftp = connect(port)
+    try:
+        start = time.perf_counter()
+        upload(sftp, local_path, "/upload.input")
+        return time.perf_counter() - start
+    finally:
+        sftp.close()
+        transport.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="SFTP upload throughput benchmark")
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--rtts", type=float, nargs="+", default=[0, 0.02, 0.1], help="round-trip times in seconds")
+    parser.add_argument("--request-sizes-kb", type=int, nargs="+", default=[32, 128, 255])
+    args = parser.parse_args()
+
+    variants = [("paramiko put (defaults)", paramiko_defaults, lambda sftp, local, remote: sftp.put(local, remote))]
+    for request_kb in args.request_sizes_kb:
+        request_size = request_kb * 1024
+        variants.append((f"upload_file {request_kb} KB", tuned, lambda sftp, local, remote, size=request_size: upload_file(sftp, local, remote, request_size=size)))
+
+    print(f"{'rtt':>7}{'size':>9}  {'variant':<26}{'seconds':>9}{'MB/s':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, "root")
+        os.makedirs(root)
+        for rtt in args.rtts:
+            process, port = start_server_process(root, "--rtt", rtt)
+            try:
+                for size_mb in args.sizes_mb:
+                    local_path = os.path.join(directory, "local.input")
+                    with open(local_path, "wb") as file:
+                        file.write(os.urandom(int(size_mb * 1024 * 1024)))
+                    for label, connect, upload in variants:
+                        seconds = measure(connect, port, upload, local_path)
+                        print(f"{rtt * 1000:>5.0f}ms{size_mb:>7.1f}MB  {label:<26}{seconds:>9.3f}{size_mb / seconds:>9.1f}", flush=True)
+            finally:
+                process.terminate()
+                process.wait()
+
+if __name__ == "__main__":
+    main()
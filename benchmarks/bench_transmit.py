@@ -0,0 +1,154 @@
+# End-to-end save-then-transmit benchmark against the local stand-in server.
+# For each simulated link it saves a generated file through save_before_transmit,
+# connects, uploads and verifies it the way the transmit dialog does, then
+# edits a few records and does it again. It also sends several files through
+# the transmission queue with one and with several channels, and checks that
+# an upload cut off mid-file resumes. Every remote file is compared with the
+# local one, so this doubles as an offline regression test; the exit status is
+# non-zero if any check fails.
+#
+#   python benchmarks/bench_transmit.py [--records 100000] [--rtts 0 0.05] [--bandwidths-mbps 0 50]
+import argparse
+import filecmp
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "src"))
+from record_store import RecordStore
+from sftp_client import SFTPSessionManager, remote_file_path, resumable_upload
+from sftp_transmitter import save_before_transmit
+from transmission_queue import SENT, TransmissionQueue
+from bench_save_data import make_columns
+from sftp_test_server import USERNAME, PASSWORD, start_server_process
+
+HOST = "127.0.0.1"
+REMOTE_DIR = "/inbound"
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+class Scenario:
+    def __init__(self, directory, rtt=0.0, bandwidth_mbps=0.0, drop_after=None):
+        self.root = os.path.join(directory, "server")
+        os.makedirs(os.path.join(self.root, REMOTE_DIR.lstrip("/")), exist_ok=True)
+        options = ["--rtt", rtt]
+        if bandwidth_mbps:
+            options += ["--bandwidth-mbps", bandwidth_mbps]
+        if drop_after:
+            options += ["--drop-after", drop_after]
+        self.process, self.port = start_server_process(self.root, *options)
+        # A fresh manager per scenario, so the first send pays for the connect
+        self.sessions = SFTPSessionManager()
+
+    def local_copy(self, remote_name):
+        return os.path.join(self.root, REMOTE_DIR.lstrip("/"), remote_name)
+
+    def send(self, local_path, remote_name):
+        return self.sessions.run(
+            HOST, USERNAME, lambda sftp: resumable_upload(sftp, local_path, remote_file_path(REMOTE_DIR, remote_name)),
+            password=PASSWORD, port=self.port, retries=3, retry_delay=0,
+        )
+
+    def close(self):
+        self.sessions.close_all()
+        self.process.terminate()
+        self.process.wait()
+
+def check(label, local_path, remote_copy, failures):
+    if not os.path.exists(remote_copy) or not filecmp.cmp(local_path, remote_copy, shallow=False):
+        print(f"  FAILED: {label}: remote file does not match {local_path}")
+        failures.append(label)
+
+def report(label, seconds, size=None):
+    rate = f"{size / (1024 * 1024) / seconds:>9.1f} MB/s" if size and seconds else ""
+    print(f"  {label:<34}{seconds * 1000:>9.1f} ms{rate}", flush=True)
+
+def save_then_transmit(scenario, store, local_path, failures):
+    save_seconds, _ = timed(save_before_transmit, local_path, store.save)
+    size = os.path.getsize(local_path)
+    connect_seconds, _ = timed(scenario.sessions.get_sftp, HOST, USERNAME, PASSWORD, port=scenario.port)
+    upload_seconds, _ = timed(scenario.send, local_path, "paysrp.input")
+    report("save", save_seconds, size)
+    report("connect and authenticate (cold)", connect_seconds)
+    report("upload and verify", upload_seconds, size)
+    report("save then transmit, total", save_seconds + connect_seconds + upload_seconds, size)
+    check("first send", local_path, scenario.local_copy("paysrp.input"), failures)
+
+    # Edit a few records, as between two sends of the same file on cutoff day
+    for row in range(0, len(store), max(len(store) // 10, 1)):
+        store.set(row, 6, "1234")
+    edit_seconds, _ = timed(save_before_transmit, local_path, store.save)
+    resend_seconds, _ = timed(scenario.send, local_path, "paysrp.input")
+    report("save edits then resend (warm)", edit_seconds + resend_seconds, size)
+    check("resend", local_path, scenario.local_copy("paysrp.input"), failures)
+
+def queue_send(scenario, local_paths, channels, failures):
+    queue = TransmissionQueue(max_channels=channels)
+    for local_path in local_paths:
+        queue.add(local_path, f"{channels}-{os.path.basename(local_path)}")
+    start = time.perf_counter()
+    queue.start(HOST, USERNAME, PASSWORD, port=scenario.port, remote_dir=REMOTE_DIR, retry_delay=0)
+    while queue.is_running():
+        time.sleep(0.01)
+    seconds = time.perf_counter() - start
+    report(f"queue of {len(local_paths)}, {channels} channel(s)", seconds, sum(map(os.path.getsize, local_paths)))
+    for job in queue.snapshot():
+        if job.status != SENT:
+            print(f"  FAILED: queue: {job.remote_name} {job.status} {job.error}")
+            failures.append("queue")
+        else:
+            check("queue", job.local_path, scenario.local_copy(job.remote_name), failures)
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end save-then-transmit benchmark")
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--rtts", type=float, nargs="+", default=[0, 0.05], help="round-trip times in seconds")
+    parser.add_argument("--bandwidths-mbps", type=float, nargs="+", default=[0, 50], help="link bandwidths, 0 for unlimited")
+    parser.add_argument("--queue-files", type=int, default=4)
+    args = parser.parse_args()
+
+    store = RecordStore()
+    store.extend(make_columns(args.records))
+    failures = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        local_path = os.path.join(directory, "paysrp.nben902.sccea.input")
+        for rtt, bandwidth_mbps in itertools.product(args.rtts, args.bandwidths_mbps):
+            link = f"rtt {rtt * 1000:.0f} ms, " + (f"{bandwidth_mbps:g} Mbit/s" if bandwidth_mbps else "unlimited bandwidth")
+            print(f"{args.records:,} records, {link}")
+            scenario = Scenario(os.path.join(directory, f"{rtt}-{bandwidth_mbps}"), rtt, bandwidth_mbps)
+            try:
+                save_then_transmit(scenario, store, local_path, failures)
+                queued = []
+                for index in range(args.queue_files):
+                    queued.append(os.path.join(directory, f"agency{index}.input"))
+                    store.save(queued[-1])
+                for channels in (1, 3):
+                    queue_send(scenario, queued, channels, failures)
+            finally:
+                scenario.close()
+
+        # The connection is cut halfway through; the retry resumes the upload
+        print("connection dropped mid-upload")
+        scenario = Scenario(os.path.join(directory, "drop"), drop_after=os.path.getsize(local_path) // 2)
+        try:
+            seconds, _ = timed(scenario.send, local_path, "dropped.input")
+            report("upload with one reconnect", seconds, os.path.getsize(local_path))
+            check("resume after drop", local_path, scenario.local_copy("dropped.input"), failures)
+        except Exception as e:
+            print(f"  FAILED: resume after drop: {e}")
+            failures.append("resume after drop")
+        finally:
+            scenario.close()
+
+    print("all checks passed" if not failures else f"{len(failures)} check(s) failed")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+# A local stand-in for the OSC SFTP endpoint, built on paramiko's server
+# classes. It serves a local directory and can sit behind a proxy that adds
+# round-trip latency, limits bandwidth and drops connections, so uploads can
+# be measured and tested without the real server.
+#
+#   python benchmarks/sftp_test_server.py --root /tmp/sftp-root --rtt 0.05
+#   python benchmarks/sftp_test_server.py --root /tmp/sftp-root --bandwidth-mbps 20 --drop-after 5000000
+import argparse
+import collections
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import paramiko
+
+USERNAME = "sccea_paysr"
+PASSWORD = "test"
+WINDOW_SIZE = 16 * 1024 * 1024
+MAX_PACKET_SIZE = 256 * 1024
+
+class StubServer(paramiko.ServerInterface):
+    def __init__(self, username, password, transport=None, max_sessions=None):
+        self.username = username
+        self.password = password
+        self.transport = transport
+        self.max_sessions = max_sessions
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (self.username, self.password):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            # Like OpenSSH's MaxSessions: refuse channels beyond the limit
+            if self.max_sessions is not None:
+                open_channels = [channel for channel in self.transport._channels.values() if not channel.closed]
+                if len(open_channels) >= self.max_sessions:
+                    return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+class StubHandle(paramiko.SFTPHandle):
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+    def chattr(self, attr):
+        return paramiko.SFTP_OK
+
+class StubSFTPServer(paramiko.SFTPServerInterface):
+    def __init__(self, server, *args, root=None, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.root = root
+
+    def local_path(self, path):
+        return os.path.join(self.root, path.lstrip("/"))
+
+    def canonicalize(self, path):
+        return "/" + path.lstrip("/")
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self.local_path(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def list_folder(self, path):
+        try:
+            path = self.local_path(path)
+            return [paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(path, name)), name) for name in os.listdir(path)]
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def open(self, path, flags, attr):
+        try:
+            fd = os.open(self.local_path(path), flags | getattr(os, "O_BINARY", 0), 0o644)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            mode = "rb"
+        handle = StubHandle(flags)
+        handle.readfile = handle.writefile = os.fdopen(fd, mode)
+        return handle
+
+    def remove(self, path):
+        try:
+            os.remove(self.local_path(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def rename(self, oldpath, newpath):
+        if os.path.exists(self.local_path(newpath)):
+            return paramiko.SFTP_FAILURE
+        return self.posix_rename(oldpath, newpath)
+
+    def posix_rename(self, oldpath, newpath):
+        try:
+            os.replace(self.local_path(oldpath), self.local_path(newpath))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def mkdir(self, path, attr):
+        try:
+            os.mkdir(self.local_path(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+class LinkProxy:
+    # Forwards TCP connections to target_port over a simulated link. Every
+    # chunk of data is held for half the round-trip time in each direction
+    # (data keeps streaming while earlier chunks wait, like a real long link)
+    # and each direction is paced to bandwidth bytes per second. The first
+    # drop_count connections are cut after drop_after bytes from the client,
+    # to exercise reconnect and resume.
+    def __init__(self, target_port, rtt=0.0, bandwidth=None, drop_after=None, drop_count=0, host="127.0.0.1", port=0):
+        self.target = (host, target_port)
+        self.delay = rtt / 2
+        self.bandwidth = bandwidth
+        self.drop_after = drop_after
+        self.drop_count = drop_count
+        self.connections = 0
+        self.listener = socket.create_server((host, port))
+        self.port = self.listener.getsockname()[1]
+
+    def serve_forever(self):
+        while True:
+            client, _ = self.listener.accept()
+            upstream = socket.create_connection(self.target)
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            drop_after = self.drop_after if self.connections < self.drop_count else None
+            self.connections += 1
+            self.pipe(client, upstream, drop_after)
+            self.pipe(upstream, client)
+
+    def pipe(self, source, destination, drop_after=None):
+        pending = collections.deque()
+        condition = threading.Condition()
+
+        def receive():
+            received = 0
+            while True:
+                try:
+                    data = source.recv(65536)
+                except OSError:
+                    data = b""
+                received += len(data)
+                if drop_after is not None and received >= drop_after:
+                    close(source)
+                    close(destination)
+                    data = b""
+                with condition:
+                    pending.append((time.monotonic() + self.delay, data))
+                    condition.notify()
+                if not data:
+                    return
+
+        def send():
+            free_at = time.monotonic()
+            while True:
+                with condition:
+                    while not pending:
+                        condition.wait()
+                    due, data = pending[0]
+                    wait = max(due, free_at) - time.monotonic()
+                    if wait > 0:
+                        condition.wait(wait)
+                        continue
+                    pending.popleft()
+                if not data:
+                    close(destination)
+                    return
+                try:
+                    destination.sendall(data)
+                except OSError:
+                    close(source)
+                    return
+                if self.bandwidth:
+                    free_at = max(free_at, time.monotonic()) + len(data) / self.bandwidth
+
+        threading.Thread(target=receive, daemon=True).start()
+        threading.Thread(target=send, daemon=True).start()
+
+def close(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    sock.close()
+
+def start_server(root, host="127.0.0.1", port=0, username=USERNAME, password=PASSWORD, rtt=0.0, bandwidth=None, drop_after=None, drop_count=0, max_sessions=None):
+    # Starts serving root on background threads and returns the port to connect to
+    host_key = paramiko.RSAKey.generate(2048)
+    simulated = bool(rtt or bandwidth or drop_count)
+    listener = socket.create_server((host, 0 if simulated else port))
+
+    def accept():
+        while True:
+            conn, _ = listener.accept()
+            transport = paramiko.Transport(conn, default_window_size=WINDOW_SIZE, default_max_packet_size=MAX_PACKET_SIZE)
+            transport.add_server_key(host_key)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, StubSFTPServer, root=root)
+            transport.start_server(server=StubServer(username, password, transport, max_sessions))
+
+    threading.Thread(target=accept, daemon=True).start()
+    if not simulated:
+        return listener.getsockname()[1]
+
+    proxy = LinkProxy(listener.getsockname()[1], rtt, bandwidth, drop_after, drop_count, host, port)
+    threading.Thread(target=proxy.serve_forever, daemon=True).start()
+    return proxy.port
+
+def start_server_process(root, *options):
+    # Runs the server in its own process, so its threads don't compete with
+    # the client for the GIL. Returns the process and the port to connect to.
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--root", root, *map(str, options)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    line = process.stdout.readline()
+    return process, int(line.rsplit(":", 1)[1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SFTP stand-in server")
+    parser.add_argument("--root", required=True, help="directory to serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="port to listen on (default: any free port)")
+    parser.add_argument("--username", default=USERNAME)
+    parser.add_argument("--password", default=PASSWORD)
+    parser.add_argument("--rtt", type=float, default=0.0, help="simulated round-trip time in seconds")
+    parser.add_argument("--bandwidth-mbps", type=float, help="simulated bandwidth in megabits per second, each way")
+    parser.add_argument("--drop-after", type=int, help="cut connections after this many bytes from the client")
+    parser.add_argument("--drop-count", type=int, default=1, help="how many connections --drop-after applies to")
+    parser.add_argument("--max-sessions", type=int, help="refuse session channels beyond this many per connection")
+    args = parser.parse_args()
+
+    # Clients hanging up mid-session is expected here, not worth a traceback
+    logging.getLogger("paramiko").addHandler(logging.NullHandler())
+    os.makedirs(args.root, exist_ok=True)
+    bandwidth = args.bandwidth_mbps * 1000000 / 8 if args.bandwidth_mbps else None
+    drop_count = args.drop_count if args.drop_after else 0
+    port = start_server(args.root, args.host, args.port, args.username, args.password, args.rtt, bandwidth, args.drop_after, drop_count, args.max_sessions)
+    print(f"listening on {args.host}:{port}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
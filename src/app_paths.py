@@ -0,0 +1,19 @@
+import os
+import sys
+
+APP_NAME = "NBEN902_Editor"
+
+def app_data_dir():
+    # Per-user folder for state the app keeps between runs
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(base, APP_NAME)
+
+def app_data_path(file_name):
+    directory = app_data_dir()
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, file_name)
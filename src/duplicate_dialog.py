@@ -0,0 +1,88 @@
+import tkinter as tk
+from tkinter import ttk
+from editable_table import KEEP_BOTH, KEEP_EXISTING, REPLACE
+
+# Conflicts listed in the dialog; the count covers all of them
+SAMPLE_SIZE = 500
+
+class DuplicateDialog(tk.Toplevel):
+    # Shows added records whose Employee ID, Deduction Code and Agency Code
+    # match a record already in the table, next to that record, and asks which
+    # to keep. Closing the window keeps the existing records. A record without
+    # an Agency Code, as members added from a roster usually are, matches a
+    # row with any agency.
+    def __init__(self, parent, store, batch, positions, row_ids, source):
+        super().__init__(parent)
+        self.title("Duplicate Records")
+        self.geometry("800x400")
+        self.transient(parent)
+        self.choice = KEEP_EXISTING
+
+        tk.Label(
+            self, justify="left", anchor="w", wraplength=760,
+            text=(
+                f"{len(positions):,} records from {source} have the same Employee ID, Deduction Code and Agency Code "
+                "as records already in the table (a missing Agency Code matches any). "
+                "Your choice also applies to any more found in the same import."
+            ),
+        ).pack(fill="x", padx=10, pady=(10, 0))
+
+        name_col = store.column_index("Name")
+        amount_col = store.column_index("Deduction Amount")
+        columns = (
+            ("key", "Employee ID / Code / Agency", 200), ("existing_name", "Existing Name", 170), ("existing_amount", "Amount", 70),
+            ("new_name", "New Name", 170), ("new_amount", "Amount", 70),
+        )
+        self.conflict_view = ttk.Treeview(self, columns=[column for column, _, _ in columns], show="headings")
+        for column, heading, width in columns:
+            self.conflict_view.heading(column, text=heading)
+            self.conflict_view.column(column, width=width)
+        scrollbar = tk.Scrollbar(self, orient="vertical", command=self.conflict_view.yview)
+        self.conflict_view.configure(yscrollcommand=scrollbar.set)
+
+        for position, row_id in zip(positions[:SAMPLE_SIZE].tolist(), row_ids[:SAMPLE_SIZE].tolist()):
+            existing = store.get_row(row_id)
+            key = " / ".join(existing[col] for col in store.key_cols)
+            self.conflict_view.insert("", "end", values=(
+                key, existing[name_col], existing[amount_col],
+                store.decode(batch[name_col][position]), store.decode(batch[amount_col][position]),
+            ))
+
+        button_frame = tk.Frame(self)
+        button_frame.pack(side="bottom", pady=10)
+        tk.Button(button_frame, text="Keep Existing", command=lambda: self.choose(KEEP_EXISTING)).pack(side="left", padx=5)
+        tk.Button(button_frame, text="Replace", command=lambda: self.choose(REPLACE)).pack(side="left", padx=5)
+        tk.Button(button_frame, text="Keep Both", command=lambda: self.choose(KEEP_BOTH)).pack(side="left", padx=5)
+
+        scrollbar.pack(side="right", fill="y", padx=(0, 10), pady=10)
+        self.conflict_view.pack(fill="both", expand=True, padx=(10, 0), pady=10)
+        self.grab_set()
+
+    def choose(self, choice):
+        self.choice = choice
+        self.destroy()
+
+class DuplicateResolver:
+    # Passed to EditableTable.add_rows as resolve. Asks once per import, so
+    # a file added in chunks prompts at most once, and counts the records
+    # handled for the status line.
+    def __init__(self, parent, store, source):
+        self.parent = parent
+        self.store = store
+        self.source = source
+        self.choice = None
+        self.duplicates = 0
+
+    def __call__(self, batch, positions, row_ids):
+        if self.choice is None:
+            dialog = DuplicateDialog(self.parent, self.store, batch, positions, row_ids, self.source)
+            self.parent.wait_window(dialog)
+            self.choice = dialog.choice
+        self.duplicates += len(positions)
+        return self.choice
+
+    def describe(self):
+        if not self.duplicates:
+            return ""
+        action = {KEEP_EXISTING: "skipped", REPLACE: "replaced existing", KEEP_BOTH: "added anyway"}[self.choice]
+        return f"{self.duplicates:,} duplicates {action}"
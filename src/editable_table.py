@@ -1,53 +1,201 @@
 import tkinter as tk
 from tkinter import messagebox
+import numpy as np
 import pandas as pd
 import re
+from record_store import RecordStore
+from file_operations import encode_column
+from validation import validate_columns, format_errors
 from utils import ToolTip
 
+# Filled in for members added from the roster and for duplicated rows
+NEW_MEMBER_DEFAULTS = {"Deduction Code": "407", "Deduction Amount": "100"}
+
+# What to do with added records that duplicate one already in the table
+KEEP_EXISTING = "keep existing"
+REPLACE = "replace"
+KEEP_BOTH = "keep both"
+
 class EditableTable(tk.Frame):
     def __init__(self, parent, columns):
         super().__init__(parent)
         self.columns = columns
         self.grid(sticky='nsew')
-        self.create_widgets()
         self.effective_date = ""
 
+        # Records live in the columnar store and are addressed by stable row id;
+        # only the rows in the viewport get widgets, which are bound to slots, not rows
+        self.store = RecordStore()
+        self.first_row = 0
+        self.row_height = None
+        self.visible_rows = 0
+        self.yscrollcommand = None
+        self._rendering = False
+        self.locked = False
+        self.effective_date_row = None
+        self.create_widgets()
+
     def create_widgets(self):
-        self.entries = []
         self.labels = []
-        self.delete_buttons = []
-        self.duplicate_buttons = []
-        
+        self.slots = []
+        self.check_length_command = self.register(self.check_length)
+
         tooltips = {
             "Agency Code": "Agency Code for Suffolk County is 05527\nAgency Code for the Academy is 05007",
             "Deduction Code": "456 for union dues\n407 for the PAC fund",
             "Effective Date": "The Thursday after the last payday",
             "Deduction End Date": "Can be the Thursday after the last payday"
         }
-        
+
         for col, (column_name, width) in enumerate(self.columns):
             label = tk.Label(self, text=column_name, relief='ridge')
             label.grid(row=0, column=col + 1)  # Updated column to add space for Duplicate button
             self.labels.append(label)
-            
+
             if column_name in tooltips:
                 ToolTip(label, tooltips[column_name])
 
-    def load_data(self, df):
-        self.clear_table()
-        for row, record in df.iterrows():
-            self.add_row(record)
+        self.add_slot()
 
-    def add_row(self, record=None, row_idx=None):
-        if row_idx is None:
-            row_idx = len(self.entries)
+    def add_slot(self):
+        slot_idx = len(self.slots)
+        slot = {"vars": [], "entries": []}
 
-        duplicate_button = tk.Button(self, text="Duplicate", command=lambda row=row_idx: self.duplicate_row(row))
-        duplicate_button.grid(row=row_idx + 1, column=0)  # Moved duplicate button to the left of the row
-        self.duplicate_buttons.insert(row_idx, duplicate_button)
+        slot["duplicate_button"] = tk.Button(self, text="Duplicate", command=lambda slot=slot_idx: self.duplicate_row(self.slot_row_id(slot)))
 
-        entries_row = []
         for col, (column_name, width) in enumerate(self.columns):
+            var = tk.StringVar(self)
+            var.trace_add("write", lambda *args, slot=slot_idx, col=col: self.on_entry_change(slot, col))
+            entry = tk.Entry(self, width=width, textvariable=var, validate="key", validatecommand=(self.check_length_command, "%P", self.store.widths[col]))
+
+            if column_name == "Effective Date":
+                # The slot may show another row by the time focus leaves (the
+                # table scrolled), so remember the row that was being edited
+                entry.bind("<FocusIn>", lambda event, slot=slot_idx: setattr(self, "effective_date_row", self.slot_row_id(slot)))
+                entry.bind("<FocusOut>", lambda event, col=col: self.update_effective_date(self.take_effective_date_row(), col))
+
+            slot["vars"].append(var)
+            slot["entries"].append(entry)
+
+        slot["delete_button"] = tk.Button(self, text="Delete", command=lambda slot=slot_idx: self.delete_row(self.slot_row_id(slot)))
+        self.slots.append(slot)
+        self.lock_slot(slot)
+
+        if self.row_height is None:
+            self.row_height = max(widget.winfo_reqheight() for widget in self.slot_widgets(slot))
+
+    def set_locked(self, locked):
+        # While a file is still being read the rows can be scrolled but not changed
+        self.locked = locked
+        for slot in self.slots:
+            self.lock_slot(slot)
+
+    def lock_slot(self, slot):
+        for entry in slot["entries"]:
+            entry.config(state="readonly" if self.locked else "normal")
+        for button in (slot["duplicate_button"], slot["delete_button"]):
+            button.config(state="disabled" if self.locked else "normal")
+
+    @staticmethod
+    def check_length(value, max_length):
+        return len(value) <= int(max_length)
+
+    @staticmethod
+    def slot_widgets(slot):
+        return [slot["duplicate_button"]] + slot["entries"] + [slot["delete_button"]]
+
+    def slot_row_id(self, slot):
+        position = self.first_row + slot
+        if position < len(self.store):
+            return self.store.row_id(position)
+        return None
+
+    def row_position(self, row_id):
+        # Rows are almost always looked up from a visible slot, so check the viewport first
+        window = self.store.order[self.first_row:self.first_row + len(self.slots)]
+        if row_id in window:
+            return self.first_row + window.index(row_id)
+        return self.store.order.index(row_id)
+
+    def row_count(self):
+        return len(self.store)
+
+    def set_viewport_height(self, height):
+        header_height = max(label.winfo_reqheight() for label in self.labels)
+        visible_rows = max(1, -(-(height - header_height) // self.row_height))
+        if visible_rows == self.visible_rows:
+            return
+        self.visible_rows = visible_rows
+        while len(self.slots) < visible_rows:
+            self.add_slot()
+        self.scroll_to(self.first_row)
+
+    def set_yscrollcommand(self, command):
+        self.yscrollcommand = command
+        self.update_scrollbar()
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(round(float(args[1]) * len(self.store)))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= max(1, self.visible_rows - 1)
+            self.scroll_to(self.first_row + amount)
+
+    def yview_scroll(self, amount, what):
+        self.yview("scroll", amount, what)
+
+    def see(self, row):
+        if row < self.first_row:
+            self.scroll_to(row)
+        elif row >= self.first_row + self.visible_rows - 1:
+            self.scroll_to(row - self.visible_rows + 2)
+
+    def scroll_to(self, row):
+        max_first_row = max(0, len(self.store) - self.visible_rows + 1)
+        self.first_row = min(max(0, row), max_first_row)
+        self.render()
+
+    def render(self):
+        self._rendering = True
+        try:
+            for slot_idx, slot in enumerate(self.slots):
+                row = self.first_row + slot_idx
+                if slot_idx < self.visible_rows and row < len(self.store):
+                    for var, value in zip(slot["vars"], self.store.get_row(self.store.row_id(row))):
+                        if var.get() != value:
+                            var.set(value)
+                    slot["duplicate_button"].grid(row=slot_idx + 1, column=0)  # Moved duplicate button to the left of the row
+                    for col, entry in enumerate(slot["entries"]):
+                        entry.grid(row=slot_idx + 1, column=col + 1)  # Updated column to add space for Duplicate button
+                    slot["delete_button"].grid(row=slot_idx + 1, column=len(self.columns) + 1)
+                else:
+                    for widget in self.slot_widgets(slot):
+                        widget.grid_remove()
+        finally:
+            self._rendering = False
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        if self.yscrollcommand is None:
+            return
+        total = len(self.store)
+        if total == 0:
+            self.yscrollcommand(0.0, 1.0)
+        else:
+            self.yscrollcommand(self.first_row / total, min(1.0, (self.first_row + self.visible_rows) / total))
+
+    def on_entry_change(self, slot, col):
+        if self._rendering:
+            return
+        row_id = self.slot_row_id(slot)
+        if row_id is not None:
+            self.store.set(row_id, col, self.slots[slot]["vars"][col].get())
+
+    def make_record(self, record=None):
+        values = []
+        for column_name, width in self.columns:
             if record is None:
                 if column_name == "Employee ID":
                     value = "N"
@@ -55,120 +203,107 @@ class EditableTable(tk.Frame):
                     value = self.effective_date
                 else:
                     value = ""
-            elif pd.isna(record[column_name]) and column_name == "Deduction End Date":
+            elif pd.isna(record[column_name]):
                 value = ""
             else:
-                value = record[column_name]
+                value = str(record[column_name])
                 if column_name == "Name":
                     value = value.upper()
-            entry = tk.Entry(self, width=width)
-            entry.insert(0, value)
-            entry.grid(row=row_idx + 1, column=col + 1)  # Updated column to add space for Duplicate button
-
-            if column_name == "Effective Date":
-                entry.bind("<FocusOut>", lambda event, row=row_idx, col=col: self.update_effective_date(row, col))
-
-            entries_row.append(entry)
-        self.entries.insert(row_idx, entries_row)
+            values.append(value)
+        return values
 
-        delete_button = tk.Button(self, text="Delete", command=lambda row=row_idx: self.delete_row(row))
-        delete_button.grid(row=row_idx + 1, column=len(self.columns) + 1)
-        self.delete_buttons.insert(row_idx, delete_button)
+    def add_rows(self, columns, defaults=None, position=None, resolve=None, existing=None):
+        # Adds a batch of rows with one pass per column and one redraw.
+        # columns maps column names to equal-length arrays of str or bytes, or
+        # is a list of them in column order; columns it leaves out are filled
+        # from defaults, or left blank.
+        #
+        # With resolve, records whose key is already in the table (in a row
+        # with an id below existing, if given) are passed to it as
+        # resolve(batch, positions, row_ids), and it returns KEEP_EXISTING,
+        # REPLACE or KEEP_BOTH.
+        if not isinstance(columns, dict):
+            columns = dict(zip(self.store.column_names, columns))
+        count = len(next(iter(columns.values()))) if columns else 0
+        defaults = defaults or {}
+        batch = []
+        for column_name in self.store.column_names:
+            if column_name in columns:
+                values = np.asarray(columns[column_name])
+                if values.dtype.kind not in "SU":
+                    values = values.astype(str)
+                if column_name == "Name":
+                    values = np.char.upper(values)
+            else:
+                values = np.full(count, defaults.get(column_name, ""))
+            batch.append(values)
+        if resolve is not None and count:
+            batch = [encode_column(values) for values in batch]
+            positions, row_ids = self.store.match_keys(batch, existing)
+            choice = resolve(batch, positions, row_ids) if len(positions) else KEEP_BOTH
+            if choice == REPLACE:
+                self.store.replace_rows(row_ids, batch, positions)
+            if choice != KEEP_BOTH:
+                keep = np.ones(count, dtype=bool)
+                keep[positions] = False
+                batch = [values[keep] for values in batch]
+        row_ids = self.store.extend(batch, position)
+        self.render()
+        return row_ids
 
-        # Update the positions of the subsequent rows
-        for i in range(row_idx + 1, len(self.entries)):
-            for col, entry in enumerate(self.entries[i]):
-                entry.grid(row=i + 1, column=col + 1)  # Updated column to add space for Duplicate button
-            self.delete_buttons[i].grid(row=i + 1, column=len(self.columns) + 1)
-            self.delete_buttons[i].config(command=lambda row=i: self.delete_row(row))
+    def add_row(self, record=None, row_idx=None):
+        row_id = self.store.insert(self.make_record(record), row_idx)
+        self.render()
+        return row_id
 
-            self.duplicate_buttons[i].grid(row=i + 1, column=0)  # Moved duplicate button to the left of the row
-            self.duplicate_buttons[i].config(command=lambda row=i: self.duplicate_row(row))
+    def take_effective_date_row(self):
+        row_id = self.effective_date_row
+        self.effective_date_row = None
+        return row_id
 
-    def update_effective_date(self, row, col):
-        effective_date = self.entries[row][col].get()
+    def update_effective_date(self, row_id, col):
+        if row_id is None or self.locked:
+            return
+        effective_date = self.store.get(row_id, col)
         if re.match(r'^\d{2}-\d{2}-\d{4}$', effective_date):
             self.effective_date = effective_date
-            for r in range(len(self.entries)):
-                self.entries[r][col].delete(0, tk.END)
-                self.entries[r][col].insert(0, effective_date)
-
-    def delete_row(self, row):
-        for entry in self.entries[row]:
-            entry.destroy()
-        self.entries.pop(row)
-
-        self.delete_buttons[row].destroy()
-        self.delete_buttons.pop(row)
-
-        self.duplicate_buttons[row].destroy()
-        self.duplicate_buttons.pop(row)
-
-        for i in range(row, len(self.entries)):
-            for col, entry in enumerate(self.entries[i]):
-                entry.grid(row=i + 1, column=col + 1)  # Updated column to add space for Duplicate button
-            self.delete_buttons[i].grid(row=i + 1, column=len(self.columns) + 1)
-            self.delete_buttons[i].config(command=lambda row=i: self.delete_row(row))
+            self.store.fill_column(col, effective_date)
+            self.render()
 
-            self.duplicate_buttons[i].grid(row=i + 1, column=0)  # Moved duplicate button to the left of the row
-            self.duplicate_buttons[i].config(command=lambda row=i: self.duplicate_row(row))
+    def delete_row(self, row_id):
+        if row_id is None:
+            return
+        self.store.remove(self.row_position(row_id))
+        self.scroll_to(self.first_row)
 
-    def duplicate_row(self, row):
-        record_values = [entry.get() for entry in self.entries[row]]
-        record = pd.Series(record_values, index=[col[0] for col in self.columns])
+    def duplicate_row(self, row_id):
+        if row_id is None:
+            return
+        record = pd.Series(self.store.get_row(row_id), index=[col[0] for col in self.columns])
 
         # Update specific values for the duplicated row
-        record["Deduction Code"] = "407"
-        record["Deduction Amount"] = "100"
+        for column_name, value in NEW_MEMBER_DEFAULTS.items():
+            record[column_name] = value
 
-        self.add_row(record, row + 1)
+        return self.add_row(record, self.row_position(row_id) + 1)
 
     def clear_table(self):
-        for row in self.entries:
-            for entry in row:
-                entry.destroy()
-        self.entries = []
-
-        for button in self.delete_buttons:
-            button.destroy()
-        self.delete_buttons = []
-
-        for button in self.duplicate_buttons:
-            button.destroy()
-        self.duplicate_buttons = []
-
-    def get_data(self):
-        data = []
-        for row_idx, row in enumerate(self.entries):
-            record = []
-            for col, (column_name, width) in enumerate(self.columns):
-                value = row[col].get()
-
-                if not self.validate_value(column_name, value):
-                    messagebox.showerror("Input Validation Error", f"Invalid value for {column_name} at row {row_idx + 1}.")
-                    return None
+        self.store.clear()
+        self.scroll_to(0)
 
-                if column_name == "Name":
-                    value = value.upper()
-                record.append(value)
-            data.append(record)
-        return data
+    def has_unsaved_changes(self):
+        return self.store.is_modified()
 
-    @staticmethod
-    def validate_value(column_name, value):
-        if column_name == "Agency Code":
-            return bool(value)
-        elif column_name == "Name":
-            return bool(value)
-        elif column_name == "Employee ID":
-            return re.match(r'^N\d{8}$', value)
-        elif column_name == "Deduction Code":
-            return bool(value)
-        elif column_name == "Effective Date":
-            return value == "" or re.match(r'^\d{2}-\d{2}-\d{4}$', value)
-        elif column_name == "Deduction End Date":
-            return value == "" or re.match(r'^\d{2}-\d{2}-\d{4}$', value)
-        elif column_name == "Deduction Amount":
-            return value.replace(".", "", 1).isdigit() and float(value) > 0
-        else:
+    def validate(self):
+        errors = validate_columns({column_name: self.store.column(col) for col, column_name in enumerate(self.store.column_names)})
+        if errors:
+            self.see(errors[0][0])
+            messagebox.showerror("Input Validation Error", f"Found {len(errors)} invalid value(s):\n\n{format_errors(errors)}")
+            return False
+        return True
+
+    def save(self, file_path):
+        if not self.validate():
             return False
+        self.store.save(file_path)
+        return True
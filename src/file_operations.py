@@ -1,23 +1,258 @@
+import mmap
+import os
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
 
+# NBEN902 record layout
+COLUMN_NAMES = ["Agency Code", "Name", "Employee ID", "Deduction Code", "Effective Date", "Deduction End Date", "Deduction Amount"]
+COLSPECS = [(0, 10), (10, 60), (60, 69), (69, 75), (75, 85), (85, 95), (95, 103)]
+COL_WIDTHS = [end - start for start, end in COLSPECS]
+AMOUNT_COLUMN = COLUMN_NAMES.index("Deduction Amount")
+RECORD_LENGTH = COLSPECS[-1][1]
+ENCODING = "latin-1"
+
+def parse_amount(value):
+    # Amounts are zero filled in the file but edited without the padding
+    return value.lstrip("0") or ("0" if value else "")
+
+def parse_record(line):
+    record = [line[start:end].strip() for start, end in COLSPECS]
+    record[AMOUNT_COLUMN] = parse_amount(record[AMOUNT_COLUMN])
+    return record
+
+def iter_records(file_path):
+    with open(file_path, "r", encoding=ENCODING, newline=None) as file:
+        for line in file:
+            line = line.rstrip("\r\n")
+            if line.strip():
+                yield parse_record(line)
+
+def columns_from_lines(lines):
+    columns = [[line[start:end].strip() for line in lines] for start, end in COLSPECS]
+    columns[AMOUNT_COLUMN] = [parse_amount(value) for value in columns[AMOUNT_COLUMN]]
+    return columns
+
+def decode_column(values):
+    # Latin-1 maps every byte to the code point of the same value, so an array of
+    # byte strings is decoded by widening each byte to a 4-byte unicode char
+    values = np.ascontiguousarray(values)
+    width = values.dtype.itemsize
+    return values.view(np.uint8).reshape(len(values), width).astype(np.uint32).view(f"U{width}").reshape(len(values))
+
+def encode_column(values):
+    # Inverse of decode_column; falls back to np.char.encode (which replaces
+    # unencodable characters) only when a value is outside latin-1
+    values = np.asarray(values)
+    if values.dtype.kind == "S":
+        return values
+    if values.dtype.kind != "U":
+        values = values.astype(str)
+    width = max(1, values.dtype.itemsize // 4)
+    values = np.ascontiguousarray(values, dtype=f"U{width}")
+    code_points = values.view(np.uint32).reshape(len(values), width)
+    if code_points.size and code_points.max() > 0xFF:
+        return np.char.encode(values, ENCODING, "replace")
+    return code_points.astype(np.uint8).view(f"S{width}").reshape(len(values))
+
+def parse_amount_column(values):
+    stripped = np.char.lstrip(values, b"0")
+    return np.where((stripped == b"") & (values != b""), b"0", stripped).astype(values.dtype)
+
+class MappedRecordFile:
+    # Memory-maps a file of fixed-width records as a NumPy structured array
+    # over the mapping, so column batches are sliced out without reading the
+    # file through Python line by line. Each batch is a copy: the store keeps
+    # its own arrays, and the mapping is closed once the file has been read.
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.file = open(file_path, "rb")
+        self.mmap = None
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+            if size == 0:
+                self.line_ending = os.linesep.encode()
+                self.records = np.empty(0, dtype=self.record_dtype())
+                return
+
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            newline = self.mmap.find(b"\n")
+            if newline == -1:
+                self.line_ending = b""
+                record_end = size
+            elif newline > 0 and self.mmap[newline - 1] == ord("\r"):
+                self.line_ending = b"\r\n"
+                record_end = newline - 1
+            else:
+                self.line_ending = b"\n"
+                record_end = newline
+            if record_end != RECORD_LENGTH:
+                raise ValueError(f"{file_path} does not contain {RECORD_LENGTH} character records")
+
+            self.stride = RECORD_LENGTH + len(self.line_ending)
+            count = (size + len(self.line_ending)) // self.stride
+            if count * self.stride - len(self.line_ending) not in (size, size - len(self.line_ending)):
+                raise ValueError(f"{file_path} has records of different lengths")
+
+            self.records = np.ndarray((count,), dtype=self.record_dtype(), buffer=self.mmap, strides=(self.stride,))
+            endings = np.ndarray((count - 1,), dtype=f"S{len(self.line_ending)}", buffer=self.mmap, offset=RECORD_LENGTH, strides=(self.stride,))
+            if not (endings == self.line_ending).all():
+                raise ValueError(f"{file_path} has records of different lengths")
+        except Exception:
+            self.close()
+            raise
+
+    @staticmethod
+    def record_dtype():
+        return np.dtype({
+            "names": COLUMN_NAMES,
+            "formats": [f"S{width}" for width in COL_WIDTHS],
+            "offsets": [start for start, end in COLSPECS],
+            "itemsize": RECORD_LENGTH,
+        })
+
+    def __len__(self):
+        return len(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def column_batch(self, start=0, stop=None):
+        # Returns stripped byte-string columns for rows start:stop
+        columns = [np.char.strip(self.records[column_name][start:stop]) for column_name in COLUMN_NAMES]
+        columns[AMOUNT_COLUMN] = parse_amount_column(columns[AMOUNT_COLUMN])
+        return columns
+
+    def close(self):
+        self.records = None
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+        self.file.close()
+
+class RecordChunks:
+    # Reads the file as column batches (one array per column) so callers can
+    # show the first rows while the rest of the file is still being read. Files
+    # with uniform records are mapped and yield byte strings; anything else is
+    # read line by line and yields str. Only a uniform file has record n at
+    # n * stride, so only then may it be patched in place later.
+    def __init__(self, file_path, chunk_size=10000):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        try:
+            self.records = MappedRecordFile(file_path)
+        except ValueError:
+            self.records = None
+        self.uniform = self.records is not None
+
+    def __iter__(self):
+        if self.records is not None:
+            with self.records:
+                for start in range(0, len(self.records), self.chunk_size):
+                    yield self.records.column_batch(start, start + self.chunk_size)
+            return
+
+        with open(self.file_path, "r", encoding=ENCODING, newline=None) as file:
+            lines = []
+            for line in file:
+                if line.strip():
+                    lines.append(line.rstrip("\r\n"))
+                if len(lines) == self.chunk_size:
+                    yield columns_from_lines(lines)
+                    lines = []
+            if lines:
+                yield columns_from_lines(lines)
+
+def read_columns(file_path):
+    try:
+        with MappedRecordFile(file_path) as records:
+            return [decode_column(values).tolist() for values in records.column_batch()]
+    except ValueError:
+        pass
+
+    with open(file_path, "r", encoding=ENCODING, newline=None) as file:
+        lines = [line.rstrip("\r\n") for line in file if line.strip()]
+    return columns_from_lines(lines)
+
 def parse_fixed_width_file(file_path):
-    colspecs = [(0, 10), (10, 60), (60, 69), (69, 75), (75, 85), (85, 95), (95, 103)]
-    column_names = ["Agency Code", "Name", "Employee ID", "Deduction Code", "Effective Date", "Deduction End Date", "Deduction Amount"]
-    df = pd.read_fwf(file_path, colspecs=colspecs, header=None, names=column_names, converters={'Agency Code': str})
-    return df
+    return pd.DataFrame(dict(zip(COLUMN_NAMES, read_columns(file_path))), columns=COLUMN_NAMES)
+
+def output_dtype(line_ending):
+    return np.dtype({
+        "names": COLUMN_NAMES + ["Line Ending"],
+        "formats": [f"S{width}" for width in COL_WIDTHS] + [f"S{max(1, len(line_ending))}"],
+        "offsets": [start for start, end in COLSPECS] + [RECORD_LENGTH],
+        "itemsize": RECORD_LENGTH + len(line_ending),
+    })
+
+def serialize_columns(columns, line_ending=os.linesep.encode()):
+    # Pads or truncates each column as a whole into a preallocated record array
+    # and returns the file contents as bytes
+    count = len(columns[0]) if columns else 0
+    records = np.empty(count, dtype=output_dtype(line_ending))
+    for col, (column_name, width) in enumerate(zip(COLUMN_NAMES, COL_WIDTHS)):
+        values = encode_column(columns[col])
+        if col == AMOUNT_COLUMN:
+            records[column_name] = np.char.rjust(values, width, b"0")
+        else:
+            records[column_name] = np.char.ljust(values, width)
+    if line_ending:
+        records["Line Ending"] = line_ending
+    return records.tobytes()
+
+def write_file_atomic(file_path, data):
+    # Write next to the target and rename over it, so a crash mid-save leaves
+    # either the old file or the new one, never a truncated file
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, temp_path)
+        else:
+            os.chmod(temp_path, 0o644)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def save_columns(columns, file_path):
+    write_file_atomic(file_path, serialize_columns(columns))
+
+def detect_line_ending(file_path):
+    with open(file_path, "rb") as file:
+        ending = file.read(RECORD_LENGTH + 2)[RECORD_LENGTH:]
+    if ending.startswith(b"\r\n"):
+        return b"\r\n"
+    if ending.startswith(b"\n"):
+        return b"\n"
+    return b""
+
+def estimate_record_count(file_path):
+    # Exact for files with uniform records, close enough for progress otherwise
+    record_size = RECORD_LENGTH + len(detect_line_ending(file_path))
+    return -(-os.path.getsize(file_path) // record_size)
+
+def patch_records(file_path, positions, columns):
+    # Overwrites the records at the given row positions in place. Records are
+    # fixed width, so the file never changes size and other rows are untouched.
+    line_ending = detect_line_ending(file_path)
+    stride = RECORD_LENGTH + len(line_ending)
+    data = serialize_columns(columns, line_ending)
+    with open(file_path, "r+b") as file:
+        for index, position in enumerate(positions):
+            file.seek(int(position) * stride)
+            file.write(data[index * stride:index * stride + RECORD_LENGTH])
+        file.flush()
+        os.fsync(file.fileno())
 
 def save_data(df, file_path):
-    col_widths = [10, 50, 9, 6, 10, 10, 8]
-    with open(file_path, "w") as file:
-        for _, row in df.iterrows():
-            row_str = ""
-            for idx, value in enumerate(row):
-                if idx == 4 or idx == 5:  # Effective Date and Deduction End Date columns
-                    if value == "":
-                        value = " " * col_widths[idx]
-                if idx == 6:  # Deduction Amount field
-                    formatted_value = str(value).rjust(col_widths[idx], '0')
-                else:
-                    formatted_value = str(value).ljust(col_widths[idx], ' ')
-                row_str += formatted_value[:col_widths[idx]]
-            file.write(row_str + "\n")
+    save_columns([df.iloc[:, col].fillna("").to_numpy() for col in range(len(COLUMN_NAMES))], file_path)
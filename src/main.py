@@ -1,13 +1,16 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from editable_table import EditableTable
-from file_operations import parse_fixed_width_file, save_data
+from editable_table import EditableTable, NEW_MEMBER_DEFAULTS
+from file_operations import RecordChunks, estimate_record_count
 from member_selector import MemberSelector
+from duplicate_dialog import DuplicateResolver
 import os
 import subprocess
-import pandas as pd
-from openpyxl import load_workbook
+import threading
+from roster_cache import roster_cache
 from sftp_transmitter import SFTPTransmitter, save_before_transmit
+from sftp_client import session_manager
+from progress import FRAME_INTERVAL_MS, ProgressReporter, ProgressTracker, describe_count
 
 def main():
     root = tk.Tk()
@@ -15,6 +18,7 @@ def main():
     root.geometry("1000x600")
 
     file_path = None
+    loading_file = False
     default_filename = "paysrp.nben902.sccea.input"
     columns = [
         ("Agency Code", 10),
@@ -31,98 +35,154 @@ def main():
         new_file_path = filedialog.askopenfilename(initialfile=default_filename, filetypes=[("Input files", "*.input"), ("All files", "*.*")])
         if not new_file_path:
             return
-        new_df = parse_fixed_width_file(new_file_path)
-        current_data = editable_table.get_data()
-        if current_data:
-            current_df = pd.DataFrame(current_data, columns=[col[0] for col in columns])
-            combined_df = pd.concat([current_df, new_df], ignore_index=True)
-        else:
-            combined_df = new_df
-        editable_table.load_data(combined_df)
+        # The file's records are appended to whatever is already in the table,
+        # so existing rows are neither exported nor validated again. A file
+        # opened into an empty table is the baseline for incremental saves.
+        opened_into_empty_table = editable_table.row_count() == 0
+        # Records already in the table have lower row ids than any read from this file
+        existing_rows = editable_table.store.size
+        duplicates = DuplicateResolver(root, editable_table.store, os.path.basename(new_file_path))
+
+        # Show the first chunk right away and read the rest of the file in the
+        # background. Until the last chunk is in, nothing may save, send or
+        # change the table, or it would act on part of the file.
+        reader = RecordChunks(new_file_path)
+        chunks = iter(reader)
+        loaded = {"revision": editable_table.store.revision}
+        set_loading(True)
+        load_progress.start(estimate_record_count(new_file_path))
+        load_reporter.start()
+
+        def load_next_chunk():
+            try:
+                chunk = next(chunks, None)
+            except OSError as e:
+                load_reporter.stop(render=False)
+                set_loading(False)
+                status_label.config(text="")
+                messagebox.showerror("Error", f"Failed to read {os.path.basename(new_file_path)}: {e}")
+                return
+            if chunk is not None:
+                editable_table.add_rows(chunk, resolve=duplicates, existing=existing_rows)
+                loaded["revision"] = editable_table.store.revision
+                load_progress.advance(len(chunk[0]))
+                root.after(1, load_next_chunk)
+            else:
+                load_reporter.stop(render=False)
+                set_loading(False)
+                summary = f"Opened {os.path.basename(new_file_path)}: {load_progress.done:,} records"
+                if duplicates.duplicates:
+                    summary += f", {duplicates.describe()}"
+                status_label.config(text=summary)
+                # Only if nothing but the load changed the table. Later edits
+                # are patched into the file only if it is already exactly what
+                # a save would write; otherwise the next save rewrites it whole.
+                if opened_into_empty_table and editable_table.store.revision == loaded["revision"]:
+                    patchable = reader.uniform and editable_table.store.file_matches(new_file_path)
+                    editable_table.store.mark_saved(new_file_path, patchable=patchable)
+
+        load_next_chunk()
         file_path = new_file_path
 
+    def set_loading(loading):
+        nonlocal loading_file
+        loading_file = loading
+        state = "disabled" if loading else "normal"
+        for button in (open_button, save_button, add_row_button, modify_member_button, transmit_902_button):
+            button.config(state=state)
+        editable_table.set_locked(loading)
+
     def save_file(save_file_path=None):
         nonlocal file_path
         if not save_file_path:
             save_file_path = filedialog.asksaveasfilename(initialfile=os.path.basename(file_path) if file_path else default_filename, defaultextension=".input", filetypes=[("Input files", "*.input"), ("All files", "*.*")])
             if not save_file_path:
-                return
-        data = editable_table.get_data()
-        if data is None:
-            return
-        df = pd.DataFrame(data, columns=[col[0] for col in columns])
-        save_data(df, save_file_path)
+                return False
+        if not editable_table.save(save_file_path):
+            return False
         file_path = save_file_path
+        return True
 
     def add_new_row():
         editable_table.add_row()
+        editable_table.see(editable_table.row_count() - 1)
 
     def modify_member():
         member_file_path = filedialog.askopenfilename(title="Select Member Data File", filetypes=[("Excel files", "*.xlsx")])
         if not member_file_path:
             return
-        
-        try:
-            # Read the member data file
-            wb = load_workbook(member_file_path)
-            sheet = wb.active
-            member_data = []
-            for row in sheet.iter_rows(values_only=True):
-                member_data.append(row)
-            
-            # Extract relevant data from the member_data list
-            if member_data:
-                headers = member_data[0]
-                data = member_data[1:]
-                df_member = pd.DataFrame(data, columns=headers)
-                
-                if df_member.empty:
-                    messagebox.showerror("Error", "The member data file is empty.")
-                    return
-                
-                # Ask the user to select members
-                selector = MemberSelector(root, df_member)
-                root.wait_window(selector)
-                selected_members = selector.get_selected_members()
-                
-                for new_member_info in selected_members:
-                    new_row = {}
-                    for col in columns:
-                        column_name = col[0]
-                        if column_name in new_member_info:
-                            new_row[column_name] = new_member_info[column_name]
-                        elif column_name == "Deduction Code":
-                            new_row[column_name] = "407"
-                        elif column_name == "Deduction Amount":
-                            new_row[column_name] = "100"  # Set deduction amount to 100
-                        elif column_name == "Employee ID":
-                            new_row[column_name] = new_member_info[headers[5]]  # Use the 6th column for Employee ID
-                        else:
-                            new_row[column_name] = ""
-                    
-                    editable_table.add_row(pd.Series(new_row))
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to read the member data file: {e}")
+
+        # Read and index the roster on a worker thread so the window stays
+        # responsive; an unchanged roster comes from the cache
+        tracker = ProgressTracker()
+        result = {}
+
+        def read_roster():
+            try:
+                result["roster"], result["index"] = roster_cache.load_roster(member_file_path, tracker)
+            except Exception as e:
+                result["error"] = e
+
+        worker = threading.Thread(target=read_roster, daemon=True)
+        reporter = ProgressReporter(root, tracker, lambda snapshot: status_label.config(text=f"Reading member data... {describe_count(snapshot, 'members')}"))
+        # A file opened while the roster is read would still be loading when members are added
+        modify_member_button.config(state="disabled")
+        open_button.config(state="disabled")
+        worker.start()
+        reporter.start()
+
+        def wait_for_roster():
+            if worker.is_alive():
+                root.after(FRAME_INTERVAL_MS, wait_for_roster)
+                return
+            reporter.stop(render=False)
+            status_label.config(text="")
+            modify_member_button.config(state="normal")
+            open_button.config(state="normal")
+            if "error" in result:
+                messagebox.showerror("Error", f"Failed to read the member data file: {result['error']}")
+                return
+            roster = result["roster"]
+            if not len(roster):
+                messagebox.showerror("Error", "The member data file is empty.")
+                return
+            add_members(roster, result["index"])
+
+        root.after(FRAME_INTERVAL_MS, wait_for_roster)
+
+    def add_members(roster, index):
+        # Ask the user to select members
+        selector = MemberSelector(root, roster, index)
+        root.wait_window(selector)
+        selected_members = selector.get_selected_members()
+        if selected_members is None:
+            return
+
+        # Roster columns the 902 file uses are copied; the rest get the new-member defaults
+        duplicates = DuplicateResolver(root, editable_table.store, "the member data file")
+        editable_table.add_rows(selected_members.columns, NEW_MEMBER_DEFAULTS, resolve=duplicates)
+        editable_table.see(editable_table.row_count() - 1)
+        status_label.config(text=duplicates.describe())
 
     def transmit_902():
         nonlocal file_path
-        file_path = save_before_transmit(file_path, save_file)
-        if file_path:
+        saved_file_path = save_before_transmit(file_path, save_file)
+        if saved_file_path:
+            file_path = saved_file_path
             SFTPTransmitter(root, file_path, save_file)
             
     def close_app():
-        data = editable_table.get_data()
-        if data is None:
-            return
-        new_df = pd.DataFrame(data, columns=[col[0] for col in columns])
-
-        if file_path and not new_df.equals(parse_fixed_width_file(file_path)):
+        if loading_file:
+            if not messagebox.askokcancel("Exit", "A file is still being opened. Exit without saving?"):
+                return
+        elif editable_table.has_unsaved_changes():
             response = messagebox.askyesnocancel("Save Changes", "Do you want to save changes before closing?")
             if response is None:
                 return
-            elif response:
-                save_file()
+            elif response and not save_file():
+                return
 
+        session_manager.close_all()
         root.destroy()
 
     # Button Frame
@@ -144,7 +204,7 @@ def main():
     transmit_902_button = tk.Button(button_frame, text="Transmit 902", command=transmit_902)
     transmit_902_button.pack(side="left", padx=(0, 5), pady=5)
 
-    exit_button = tk.Button(button_frame, text="Exit", command=root.quit)
+    exit_button = tk.Button(button_frame, text="Exit", command=close_app)
     exit_button.pack(side="left", padx=(0, 10), pady=5)
 
     # Table Frame
@@ -168,19 +228,31 @@ def main():
 
     editable_table.bind("<Configure>", update_scrollregion)
 
+    def update_viewport(event):
+        editable_table.set_viewport_height(event.height)
+
+    canvas.bind("<Configure>", update_viewport)
+
     def on_mouse_wheel(event):
-        canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        editable_table.yview_scroll(int(-1*(event.delta/120)), "units")
 
     canvas.bind_all("<MouseWheel>", on_mouse_wheel)
 
-    scrollbar_y = tk.Scrollbar(table_frame, orient="vertical", command=canvas.yview)
+    # Rows are virtualized, so vertical scrolling is handled by the table rather than the canvas
+    scrollbar_y = tk.Scrollbar(table_frame, orient="vertical", command=editable_table.yview)
     scrollbar_y.grid(row=0, column=1, sticky="ns")
-    canvas.configure(yscrollcommand=scrollbar_y.set)
+    editable_table.set_yscrollcommand(scrollbar_y.set)
 
     scrollbar_x = tk.Scrollbar(root, orient="horizontal", command=canvas.xview)
     scrollbar_x.grid(row=2, column=0, sticky="ew")
     canvas.configure(xscrollcommand=scrollbar_x.set)
 
+    status_label = tk.Label(root, text="", anchor="w")
+    status_label.grid(row=3, column=0, sticky="ew", padx=10)
+
+    load_progress = ProgressTracker()
+    load_reporter = ProgressReporter(root, load_progress, lambda snapshot: status_label.config(text=f"Loading... {describe_count(snapshot)}"))
+
     root.protocol("WM_DELETE_WINDOW", close_app)
     root.mainloop()
 
@@ -0,0 +1,56 @@
+import re
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[A-Z0-9]+")
+# Employee IDs are looked up by their digits as often as in full ("12345" as
+# well as "N00012345"), so the digits after a letter prefix are indexed too,
+# with and without leading zeros
+ID_DIGITS_PATTERN = re.compile(r"[A-Z]+([0-9]+)$")
+
+class MemberIndex:
+    # Sorted array of every word of every member's name and Employee ID, with
+    # the roster row each came from. A prefix maps to one contiguous slice of
+    # it, found with two binary searches, so a search costs about the same at
+    # 100k members as at 100. Queries of several words match members having a
+    # word starting with each of them ("SMI JO" finds "SMITH, JOHN").
+    def __init__(self, roster, tokens=None, rows=None):
+        self.size = len(roster)
+        if tokens is not None:
+            # Arrays of an index built earlier, as saved by the roster cache
+            self.tokens = tokens
+            self.rows = rows
+            return
+        tokens = []
+        rows = []
+        searchable = [roster.columns[name] for name in ("Name", "Employee ID") if name in roster.columns]
+        for row, values in enumerate(zip(*searchable)):
+            for token in TOKEN_PATTERN.findall(" ".join(values).upper()):
+                tokens.append(token)
+                rows.append(row)
+                digits = ID_DIGITS_PATTERN.match(token)
+                if digits:
+                    for number in {digits.group(1), digits.group(1).lstrip("0")} - {""}:
+                        tokens.append(number)
+                        rows.append(row)
+        tokens = np.array(tokens, dtype=str)
+        order = np.argsort(tokens, kind="stable")
+        self.tokens = tokens[order]
+        self.rows = np.array(rows, dtype=np.intp)[order]
+
+    def prefix_rows(self, prefix):
+        start = np.searchsorted(self.tokens, prefix, side="left")
+        stop = np.searchsorted(self.tokens, prefix + "\uffff", side="left")
+        return self.rows[start:stop]
+
+    def search(self, query):
+        # Returns matching roster rows in roster order
+        terms = TOKEN_PATTERN.findall(query.upper())
+        if not terms:
+            return np.arange(self.size, dtype=np.intp)
+        # Longer prefixes match fewer rows, so start from the longest term
+        terms.sort(key=len, reverse=True)
+        matches = np.unique(self.prefix_rows(terms[0]))
+        for term in terms[1:]:
+            matches = matches[np.isin(matches, self.prefix_rows(term))]
+        return matches
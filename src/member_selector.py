@@ -1,47 +1,101 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
+from member_index import MemberIndex
+
+# Matches are put in the tree a page at a time, as the list is scrolled
+PAGE_SIZE = 200
 
 class MemberSelector(tk.Toplevel):
-    def __init__(self, parent, members_df):
+    def __init__(self, parent, roster, index=None):
         super().__init__(parent)
         self.title("Select Members")
-        self.geometry("300x400")
-        self.members_df = members_df
-        self.selected_members = []
+        self.geometry("450x500")
+        self.roster = roster
+        self.index = index if index is not None else MemberIndex(roster)
+        self.selected_members = None
+        # Roster rows picked so far; kept while the search changes
+        self.selected_rows = set()
+        self.matches = self.index.search("")
+        self.shown = 0
+
+        tk.Label(self, text="Search by name or Employee ID:").pack(anchor="w", padx=5, pady=(5, 0))
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(self, textvariable=self.search_var)
+        self.search_entry.pack(fill="x", padx=5, pady=5)
+        self.search_var.trace_add("write", self.on_search)
 
         self.frame = tk.Frame(self)
         self.frame.pack(expand=True, fill='both')
 
-        self.tree = ttk.Treeview(self.frame, columns=('Name',), show='headings', selectmode='none')
-        self.tree.heading('Name', text='Name')
+        columns = ('Name', 'Employee ID') if 'Employee ID' in roster.columns else ('Name',)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show='headings', selectmode='none')
+        for column in columns:
+            self.tree.heading(column, text=column)
         self.tree.pack(side="left", expand=True, fill="both")
 
         self.scrollbar_y = tk.Scrollbar(self.frame, orient="vertical", command=self.tree.yview)
         self.scrollbar_y.pack(side="right", fill="y")
-        self.tree.configure(yscrollcommand=self.scrollbar_y.set)
-
-        for index, row in self.members_df.iterrows():
-            self.tree.insert('', tk.END, values=(row['Name'],), iid=index)
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
 
         self.tree.bind('<Button-1>', self.on_click)
 
+        self.count_label = tk.Label(self, text="")
+        self.count_label.pack(pady=(5, 0))
+
         self.select_button = tk.Button(self, text="Select", command=self.select_members)
         self.select_button.pack(pady=5)
 
+        self.show_more()
+        self.search_entry.focus_set()
+        self.grab_set()
+
+    def on_search(self, *args):
+        self.matches = self.index.search(self.search_var.get())
+        self.tree.delete(*self.tree.get_children())
+        self.shown = 0
+        self.show_more()
+
+    def show_more(self):
+        rows = self.matches[self.shown:self.shown + PAGE_SIZE]
+        columns = [self.roster.columns[column] for column in self.tree["columns"]]
+        for row in rows.tolist():
+            self.tree.insert('', tk.END, values=[values[row] for values in columns], iid=row)
+            if row in self.selected_rows:
+                self.tree.selection_add(row)
+        self.shown += len(rows)
+        self.update_count()
+
+    def on_tree_scroll(self, first, last):
+        self.scrollbar_y.set(first, last)
+        if float(last) > 0.9 and self.shown < len(self.matches):
+            self.after_idle(self.show_more)
+
+    def update_count(self):
+        text = f"{len(self.matches):,} matching"
+        if self.shown < len(self.matches):
+            text += f", showing {self.shown:,}"
+        if self.selected_rows:
+            text += f" - {len(self.selected_rows):,} selected"
+        self.count_label.config(text=text)
+
     def on_click(self, event):
         item = self.tree.identify_row(event.y)
         if item:
-            if self.tree.selection() and item in self.tree.selection():
+            row = int(item)
+            if row in self.selected_rows:
+                self.selected_rows.discard(row)
                 self.tree.selection_remove(item)
             else:
+                self.selected_rows.add(row)
                 self.tree.selection_add(item)
+            self.update_count()
 
     def select_members(self):
-        selected_items = self.tree.selection()
-        self.selected_members = [self.members_df.iloc[int(item)].to_dict() for item in selected_items]
-        if not self.selected_members:
+        if not self.selected_rows:
             messagebox.showwarning("No selection", "No members selected.")
             return
+        # The picked members as a roster of their own, in roster order
+        self.selected_members = self.roster.take(sorted(self.selected_rows))
         self.destroy()
 
     def get_selected_members(self):
@@ -0,0 +1,133 @@
+import collections
+import threading
+import time
+
+# How often a ProgressReporter redraws, and how many seconds of samples the
+# throughput estimate averages over
+FRAME_INTERVAL_MS = 100
+RATE_WINDOW = 3.0
+SAMPLE_INTERVAL = 0.05
+
+Snapshot = collections.namedtuple("Snapshot", ["done", "total", "rate", "eta", "message"])
+
+class ProgressTracker:
+    # Thread-safe progress of one long operation. Workers call update() or
+    # advance() as often as they like; it only records numbers, so it is cheap.
+    # The UI reads snapshot() at its own frame rate, which turns any number of
+    # updates into at most one redraw per frame.
+    def __init__(self, total=0, window=RATE_WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.version = 0
+        self.start(total)
+
+    def start(self, total=0, message=""):
+        with self.lock:
+            self.total = total
+            self.done = 0
+            self.message = message
+            self.samples = collections.deque()
+            self.version += 1
+
+    def update(self, done, total=None, message=None):
+        now = time.monotonic()
+        with self.lock:
+            self.done = done
+            if total is not None:
+                self.total = total
+            if message is not None:
+                self.message = message
+            # The first update is the baseline, so work that was already done
+            # (a resumed upload) doesn't count towards the rate. After that keep
+            # at most one sample per SAMPLE_INTERVAL, covering the last window seconds.
+            if not self.samples or now - self.samples[-1][0] >= SAMPLE_INTERVAL:
+                self.samples.append((now, done))
+                while len(self.samples) > 2 and now - self.samples[0][0] > self.window:
+                    self.samples.popleft()
+            self.version += 1
+
+    def advance(self, amount=1):
+        with self.lock:
+            done = self.done + amount
+        self.update(done)
+
+    def set_message(self, message):
+        with self.lock:
+            self.message = message
+            self.version += 1
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            done, total, message = self.done, self.total, self.message
+            first_time, first_done = self.samples[0] if self.samples else (now, done)
+        elapsed = now - first_time
+        rate = (done - first_done) / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / rate if rate > 0 and total > done else None
+        return Snapshot(done, total, rate, eta, message)
+
+class ProgressReporter:
+    # Polls a tracker from the Tk event loop and calls render(snapshot) when
+    # something changed, at most once every interval_ms. stop() renders the
+    # final state once more so nothing reported before it is lost.
+    def __init__(self, widget, tracker, render, interval_ms=FRAME_INTERVAL_MS):
+        self.widget = widget
+        self.tracker = tracker
+        self.render = render
+        self.interval_ms = interval_ms
+        self.rendered_version = None
+        self.after_id = None
+
+    def start(self):
+        self.stop(render=False)
+        self.rendered_version = None
+        self.after_id = self.widget.after(self.interval_ms, self.poll)
+
+    def poll(self):
+        self.refresh()
+        self.after_id = self.widget.after(self.interval_ms, self.poll)
+
+    def refresh(self):
+        version = self.tracker.version
+        if version != self.rendered_version:
+            self.rendered_version = version
+            self.render(self.tracker.snapshot())
+
+    def stop(self, render=True):
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+            if render:
+                self.refresh()
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
+
+def describe_transfer(snapshot):
+    # "3.2 MB of 10.0 MB, 1.5 MB/s, 5s left"
+    text = f"{format_size(snapshot.done)} of {format_size(snapshot.total)}"
+    if snapshot.rate > 0:
+        text += f", {format_size(snapshot.rate)}/s"
+    if snapshot.eta is not None:
+        text += f", {format_duration(snapshot.eta)} left"
+    return text
+
+def describe_count(snapshot, noun="records"):
+    # "40,000 of 100,000 records, 5s left"
+    text = f"{snapshot.done:,} of {snapshot.total:,} {noun}" if snapshot.total else f"{snapshot.done:,} {noun}"
+    if snapshot.eta is not None:
+        text += f", {format_duration(snapshot.eta)} left"
+    return text
@@ -0,0 +1,309 @@
+import os
+import numpy as np
+from file_operations import COLUMN_NAMES, COL_WIDTHS, ENCODING, encode_column, patch_records, serialize_columns, write_file_atomic
+
+# Columnar storage for NBEN902 records. Every column is a NumPy array of
+# fixed-width byte strings sized to its field in the file layout. Rows are
+# appended to the arrays and addressed by a stable row id (their index in the
+# arrays); self.order holds the row ids in display order, so deleting a row
+# only drops its id from the order.
+#
+# The store also remembers the file it was last saved to (or loaded from) and
+# which rows were edited since, so saving a few edits only rewrites those
+# records. Inserting, deleting or reordering rows shifts the records after
+# them, so any of those forces a full rewrite.
+#
+# Every change bumps self.revision, so comparing it with the revision at the
+# last save tells whether there are unsaved changes without looking at the data.
+#
+# Records with the same Employee ID, Deduction Code and Agency Code are the
+# same deduction as far as OSC is concerned. self.keys maps each such key to
+# the lowest id of a row holding it, so a batch about to be added can be
+# checked against the table with one dict lookup per record. It is built on
+# first use and extended as rows are added; deleting rows or editing a key
+# field drops it, and the next lookup rebuilds it.
+#
+# Rosters usually have no Agency Code, so members added from one arrive
+# without it. self.member_keys maps Employee ID and Deduction Code alone, and
+# a record with a blank Agency Code matches a row with any agency.
+KEY_COLUMNS = ("Employee ID", "Deduction Code", "Agency Code")
+MEMBER_KEY_COLUMNS = ("Employee ID", "Deduction Code")
+
+class RecordStore:
+    def __init__(self, column_names=COLUMN_NAMES, widths=COL_WIDTHS, capacity=1024):
+        self.column_names = list(column_names)
+        self.widths = list(widths)
+        self.capacity = capacity
+        self.columns = [np.zeros(capacity, dtype=f"S{width}") for width in self.widths]
+        self.size = 0
+        self.order = []
+
+        self.dirty_rows = set()
+        self.layout_changed = True
+        self.saved_file = None
+        self.saved_positions = None
+        self.revision = 0
+        self.saved_revision = 0
+
+        self.key_cols = [self.column_index(column_name) for column_name in KEY_COLUMNS]
+        self.member_key_cols = [self.column_index(column_name) for column_name in MEMBER_KEY_COLUMNS]
+        self.agency_col = self.column_index("Agency Code")
+        self.keys = None
+        self.member_keys = None
+        self.keys_size = 0
+
+    def __len__(self):
+        return len(self.order)
+
+    def column_index(self, column_name):
+        return self.column_names.index(column_name)
+
+    def reserve(self, count):
+        needed = self.size + count
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, self.capacity * 2)
+        for col, column in enumerate(self.columns):
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[col] = grown
+        self.capacity = capacity
+
+    @staticmethod
+    def encode(value):
+        return str(value).encode(ENCODING, "replace")
+
+    @staticmethod
+    def decode(value):
+        return value.decode(ENCODING)
+
+    def insert(self, values, position=None):
+        self.reserve(1)
+        row_id = self.size
+        for col, value in enumerate(values):
+            self.columns[col][row_id] = self.encode(value)
+        self.size += 1
+        if position is None:
+            self.order.append(row_id)
+        else:
+            self.order.insert(position, row_id)
+        self.layout_changed = True
+        self.revision += 1
+        return row_id
+
+    def extend(self, columns, position=None):
+        # columns is a list of equal-length sequences of str or bytes, one per column
+        count = len(columns[0]) if columns else 0
+        self.reserve(count)
+        start = self.size
+        for col, values in enumerate(columns):
+            self.columns[col][start:start + count] = encode_column(values)
+        self.size += count
+        row_ids = range(start, start + count)
+        if position is None:
+            self.order.extend(row_ids)
+        else:
+            self.order[position:position] = row_ids
+        if count:
+            self.layout_changed = True
+            self.revision += 1
+        return row_ids
+
+    def remove(self, position):
+        self.keys = None
+        self.layout_changed = True
+        self.revision += 1
+        return self.order.pop(position)
+
+    def clear(self):
+        if self.order:
+            self.revision += 1
+        self.columns = [np.zeros(self.capacity, dtype=column.dtype) for column in self.columns]
+        self.size = 0
+        self.order = []
+        self.dirty_rows.clear()
+        self.layout_changed = True
+        self.keys = None
+
+    def row_id(self, position):
+        return self.order[position]
+
+    def get(self, row_id, col):
+        return self.decode(self.columns[col][row_id])
+
+    def get_row(self, row_id):
+        return [self.decode(column[row_id]) for column in self.columns]
+
+    def set(self, row_id, col, value):
+        value = self.encode(value)
+        if self.columns[col][row_id] != value:
+            self.columns[col][row_id] = value
+            self.dirty_rows.add(row_id)
+            self.revision += 1
+            if col in self.key_cols:
+                self.keys = None
+
+    def fill_column(self, col, value):
+        # Only rows whose value actually changes count as edits, so leaving a
+        # field that already holds the value changes nothing
+        value = self.encode(value)
+        row_ids = np.asarray(self.order, dtype=np.intp)
+        changed = row_ids[self.columns[col][row_ids] != value]
+        if not len(changed):
+            return
+        self.columns[col][changed] = value
+        self.dirty_rows.update(changed.tolist())
+        self.revision += 1
+        if col in self.key_cols:
+            self.keys = None
+
+    def record_keys(self, columns, key_cols=None):
+        # One byte string per record joining its key fields (key_cols, by
+        # default all of them) at their stored widths; columns is indexed by
+        # column like self.columns. Records without an Employee ID (rows still
+        # being filled in) get b"".
+        key_cols = self.key_cols if key_cols is None else key_cols
+        parts = [np.asarray(columns[col]).astype(self.columns[col].dtype) for col in key_cols]
+        count = len(parts[0])
+        joined = np.hstack([part.view(np.uint8).reshape(count, part.dtype.itemsize) for part in parts])
+        keys = np.ascontiguousarray(joined).view(f"S{joined.shape[1]}").reshape(count)
+        keys[parts[0] == b""] = b""
+        return keys
+
+    def index_keys(self, row_ids):
+        columns = {col: self.columns[col][row_ids] for col in self.key_cols}
+        for index, key_cols in ((self.keys, self.key_cols), (self.member_keys, self.member_key_cols)):
+            for key, row_id in zip(self.record_keys(columns, key_cols).tolist(), row_ids.tolist()):
+                if key:
+                    index.setdefault(key, row_id)
+
+    def key_index(self):
+        if self.keys is None:
+            self.keys = {}
+            self.member_keys = {}
+            self.index_keys(np.sort(np.asarray(self.order, dtype=np.intp)))
+        elif self.keys_size < self.size:
+            # Rows added since the last lookup; their ids are all higher
+            self.index_keys(np.arange(self.keys_size, self.size, dtype=np.intp))
+        self.keys_size = self.size
+        return self.keys
+
+    def match_keys(self, columns, before=None):
+        # Hash join of a batch (one array per column) against the stored rows.
+        # Returns the batch positions whose key is already in the store and
+        # the id of the row holding it; with before, only rows with lower ids
+        # count, so a file being read in chunks isn't matched against itself.
+        # A blank Agency Code on either side matches any agency.
+        keys = self.key_index()
+        member_keys = self.member_keys
+        full = self.record_keys(columns).tolist()
+        partial = self.record_keys(columns, self.member_key_cols).tolist()
+        blank_agency = (np.asarray(columns[self.agency_col]).astype(self.columns[self.agency_col].dtype) == b"").tolist()
+        positions = []
+        row_ids = []
+        for position, (key, member_key, blank) in enumerate(zip(full, partial, blank_agency)):
+            if not key:
+                continue
+            if blank:
+                row_id = member_keys.get(member_key)
+            else:
+                # A stored row without an agency has the member key as its full key
+                row_id = keys.get(key)
+                if row_id is None:
+                    row_id = keys.get(member_key)
+            if row_id is not None and (before is None or row_id < before):
+                positions.append(position)
+                row_ids.append(row_id)
+        return np.array(positions, dtype=np.intp), np.array(row_ids, dtype=np.intp)
+
+    def replace_rows(self, row_ids, columns, positions):
+        # Overwrites stored rows with the batch records at positions. Their
+        # keys already match, except that a row without an agency takes the
+        # batch record's, and then the key index is rebuilt.
+        changed_rows = set()
+        for col, values in enumerate(columns):
+            values = encode_column(values)[positions].astype(self.columns[col].dtype)
+            if col == self.agency_col:
+                # A member added without an agency keeps the row's
+                values = np.where(values == b"", self.columns[col][row_ids], values)
+            changed = self.columns[col][row_ids] != values
+            self.columns[col][row_ids[changed]] = values[changed]
+            changed_rows.update(row_ids[changed].tolist())
+            if col == self.agency_col and changed.any():
+                self.keys = None
+        if changed_rows:
+            self.dirty_rows.update(changed_rows)
+            self.revision += 1
+
+    def is_modified(self):
+        return self.revision != self.saved_revision
+
+    def column(self, col, row_ids=None):
+        if row_ids is None:
+            row_ids = self.order
+        return self.columns[col][np.asarray(row_ids, dtype=np.intp)]
+
+    def export_columns(self, row_ids=None):
+        columns = [self.column(col, row_ids) for col in range(len(self.columns))]
+        name_col = self.column_index("Name")
+        columns[name_col] = np.char.upper(columns[name_col])
+        return columns
+
+    def can_patch(self, file_path):
+        if self.layout_changed or self.saved_file is None or self.saved_file[0] != file_path:
+            return False
+        # Patch only a file nobody else has touched since we wrote it
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        return (stat.st_size, stat.st_mtime_ns) == self.saved_file[1:]
+
+    def save(self, file_path):
+        file_path = os.path.abspath(file_path)
+        if self.can_patch(file_path) and len(self.dirty_rows) <= len(self.order) // 2:
+            if self.dirty_rows:
+                row_ids = np.fromiter(self.dirty_rows, dtype=np.intp, count=len(self.dirty_rows))
+                patch_records(file_path, self.saved_positions[row_ids], self.export_columns(row_ids))
+        else:
+            data = serialize_columns(self.export_columns())
+            # Rewriting a file that already holds these bytes would only change
+            # its modification time, and make the transmission ledger hash it again
+            if not self.file_matches(file_path, data):
+                write_file_atomic(file_path, data)
+        self.mark_saved(file_path)
+
+    def file_matches(self, file_path, data=None):
+        # Whether file_path holds exactly what a full save would write: the
+        # same records, normalized (uppercase names, padded fields) and with no
+        # blank lines
+        if data is None:
+            data = serialize_columns(self.export_columns())
+        try:
+            if os.path.getsize(file_path) != len(data):
+                return False
+            with open(file_path, "rb") as file:
+                return file.read() == data
+        except OSError:
+            return False
+
+    def mark_saved(self, file_path, patchable=True):
+        # Records that the rows, in their current order, match file_path. A
+        # file whose records aren't all at their fixed offsets (blank lines,
+        # short records) can't be patched, so the next save rewrites it.
+        if not patchable:
+            self.saved_file = None
+            self.saved_positions = None
+            self.dirty_rows.clear()
+            self.layout_changed = True
+            self.saved_revision = self.revision
+            return
+        file_path = os.path.abspath(file_path)
+        order = np.asarray(self.order, dtype=np.intp)
+        self.saved_positions = np.full(self.size, -1, dtype=np.intp)
+        self.saved_positions[order] = np.arange(len(order))
+        stat = os.stat(file_path)
+        self.saved_file = (file_path, stat.st_size, stat.st_mtime_ns)
+        self.dirty_rows.clear()
+        self.layout_changed = False
+        self.saved_revision = self.revision
@@ -0,0 +1,105 @@
+import hashlib
+import io
+import json
+import os
+import zipfile
+
+import numpy as np
+
+from app_paths import app_data_path
+from file_operations import write_file_atomic
+from member_index import MemberIndex
+from roster_import import Roster, load_roster
+
+CACHE_DIR_NAME = "rosters"
+# Bump when the parsed layout changes so older caches are parsed again
+CACHE_VERSION = 2
+MAX_CACHED_ROSTERS = 4
+
+# Parsed rosters and their search index, saved as uncompressed .npz files in
+# the app data folder, one per workbook path. A cache is used only while the
+# workbook's size and modification time match what it was parsed from, so a
+# roster is read from the spreadsheet once per change instead of every time
+# members are added.
+def pack(values):
+    # Rosters are nearly always plain ASCII, which takes a quarter of the room
+    # as bytes; anything else is kept as str
+    try:
+        return values.astype(np.bytes_)
+    except UnicodeEncodeError:
+        return values
+
+def unpack(values):
+    return values.astype(str) if values.dtype.kind == "S" else values
+
+class RosterCache:
+    def __init__(self, directory=None, max_entries=MAX_CACHED_ROSTERS):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    def cache_path(self, file_path):
+        if self.directory is None:
+            self.directory = app_data_path(CACHE_DIR_NAME)
+        os.makedirs(self.directory, exist_ok=True)
+        key = hashlib.sha256(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, key + ".npz")
+
+    def source_info(self, file_path):
+        stat = os.stat(file_path)
+        return {"version": CACHE_VERSION, "path": os.path.abspath(file_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def load(self, file_path):
+        # Returns (roster, index) from the cache, or None if it is missing or stale
+        cache_path = self.cache_path(file_path)
+        try:
+            with np.load(cache_path) as arrays:
+                if json.loads(str(arrays["source"])) != self.source_info(file_path):
+                    return None
+                names = json.loads(str(arrays["columns"]))
+                roster = Roster({name: unpack(arrays[f"column{i}"]) for i, name in enumerate(names)})
+                index = MemberIndex(roster, unpack(arrays["tokens"]), arrays["rows"].astype(np.intp))
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return None
+        # Mark it recently used so it outlives rosters not opened lately
+        os.utime(cache_path)
+        return roster, index
+
+    def store(self, file_path, source, roster, index):
+        names = list(roster.columns)
+        arrays = {f"column{i}": pack(roster.columns[name]) for i, name in enumerate(names)}
+        buffer = io.BytesIO()
+        np.savez(
+            buffer, source=np.array(json.dumps(source)), columns=np.array(json.dumps(names)),
+            tokens=pack(index.tokens), rows=index.rows.astype(np.uint32), **arrays,
+        )
+        write_file_atomic(self.cache_path(file_path), buffer.getvalue())
+        self.prune()
+
+    def prune(self):
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".npz")]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[self.max_entries:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def load_roster(self, file_path, tracker=None):
+        # Returns (roster, index), parsing the workbook only if it changed
+        # since it was last cached. Safe to run on a worker thread.
+        cached = self.load(file_path)
+        if cached is not None:
+            return cached
+        # Taken before parsing, so a workbook saved mid-parse is read again next time
+        source = self.source_info(file_path)
+        roster = load_roster(file_path, tracker)
+        index = MemberIndex(roster)
+        if len(roster):
+            try:
+                self.store(file_path, source, roster, index)
+            except OSError:
+                # The cache only saves time; the roster is still good
+                pass
+        return roster, index
+
+roster_cache = RosterCache()
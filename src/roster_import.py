@@ -0,0 +1,258 @@
+import datetime
+import posixpath
+import zipfile
+from xml.etree.ElementTree import iterparse, parse
+
+import numpy as np
+from openpyxl import load_workbook
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+
+from file_operations import COLUMN_NAMES
+
+# Rosters without an "Employee ID" header carry the ID in their sixth column
+EMPLOYEE_ID_COLUMN_INDEX = 5
+CHUNK_SIZE = 5000
+
+SHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+RELATIONSHIPS_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+DOCUMENT_RELATIONSHIPS_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+class UnsupportedWorkbook(Exception):
+    pass
+
+class MissingNameColumn(ValueError):
+    pass
+
+class Roster:
+    # Member roster held as one str array per NBEN902 column it provides
+    def __init__(self, columns):
+        self.columns = columns
+        self.size = len(next(iter(columns.values()))) if columns else 0
+
+    def __len__(self):
+        return self.size
+
+    def take(self, rows):
+        return Roster({column_name: values[rows] for column_name, values in self.columns.items()})
+
+def cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.strftime("%m-%d-%Y")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+class XlsxRows:
+    # Streams cell values from the active sheet of an .xlsx file. openpyxl
+    # builds several objects for every shared string and cell, which takes
+    # most of a minute for a county-wide roster; this reads the sheet XML
+    # directly and only converts cells in the columns it is asked for. Set
+    # columns (a set of 0-based indexes) after reading the header row.
+    def __init__(self, file_path):
+        self.archive = zipfile.ZipFile(file_path)
+        self.columns = None
+        self.row_count = None
+        try:
+            self.read_workbook()
+        except Exception as e:
+            self.archive.close()
+            raise UnsupportedWorkbook(str(e))
+
+    def read_part(self, path):
+        with self.archive.open(path) as source:
+            return parse(source).getroot()
+
+    def read_workbook(self):
+        workbook = self.read_part("xl/workbook.xml")
+        relationships = {
+            relationship.get("Id"): relationship
+            for relationship in self.read_part("xl/_rels/workbook.xml.rels").iter(RELATIONSHIPS_NS + "Relationship")
+        }
+
+        def part_path(relationship):
+            target = relationship.get("Target")
+            return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+
+        view = workbook.find(f"{SHEET_NS}bookViews/{SHEET_NS}workbookView")
+        active = int(view.get("activeTab", 0)) if view is not None else 0
+        sheets = workbook.findall(f"{SHEET_NS}sheets/{SHEET_NS}sheet")
+        self.sheet_path = part_path(relationships[sheets[active].get(DOCUMENT_RELATIONSHIPS_NS + "id")])
+
+        properties = workbook.find(SHEET_NS + "workbookPr")
+        date1904 = properties is not None and properties.get("date1904") in ("1", "true")
+        self.epoch = CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+
+        self.shared_strings = []
+        self.date_styles = set()
+        for relationship in relationships.values():
+            kind = relationship.get("Type", "").rsplit("/", 1)[-1]
+            if kind == "sharedStrings":
+                self.read_shared_strings(part_path(relationship))
+            elif kind == "styles":
+                self.read_date_styles(part_path(relationship))
+
+    def read_shared_strings(self, path):
+        with self.archive.open(path) as source:
+            for _, element in iterparse(source):
+                if element.tag == SHEET_NS + "si":
+                    # Plain text, or rich text runs; phonetic hints are left out
+                    text = element.findtext(SHEET_NS + "t")
+                    if text is None:
+                        text = "".join(run.findtext(SHEET_NS + "t") or "" for run in element.iter(SHEET_NS + "r"))
+                    self.shared_strings.append(text)
+                    element.clear()
+
+    def read_date_styles(self, path):
+        styles = self.read_part(path)
+        formats = dict(BUILTIN_FORMATS)
+        for number_format in styles.iter(SHEET_NS + "numFmt"):
+            formats[int(number_format.get("numFmtId"))] = number_format.get("formatCode")
+        cell_formats = styles.find(SHEET_NS + "cellXfs")
+        if cell_formats is None:
+            return
+        for index, cell_format in enumerate(cell_formats.iter(SHEET_NS + "xf")):
+            code = formats.get(int(cell_format.get("numFmtId", 0)))
+            if code and is_date_format(code):
+                self.date_styles.add(index)
+
+    def value(self, cell):
+        kind = cell.get("t", "n")
+        if kind == "s":
+            return self.shared_strings[int(cell.findtext(SHEET_NS + "v"))]
+        if kind == "inlineStr":
+            return "".join(cell.find(SHEET_NS + "is").itertext())
+        text = cell.findtext(SHEET_NS + "v")
+        if text is None or kind in ("str", "e"):
+            return text
+        if kind == "b":
+            return text == "1"
+        if kind == "d":
+            # ISO 8601, as openpyxl writes with iso_dates=True; a bare time stays text
+            try:
+                return datetime.datetime.fromisoformat(text.rstrip("Z"))
+            except ValueError:
+                return text
+        number = float(text) if any(c in text for c in ".eE") else int(text)
+        if int(cell.get("s", 0)) in self.date_styles:
+            return from_excel(number, self.epoch)
+        return number
+
+    def __iter__(self):
+        cell_tag, row_tag, dimension_tag = SHEET_NS + "c", SHEET_NS + "row", SHEET_NS + "dimension"
+        column_indexes = {}
+        row = []
+        column = 0
+        with self.archive.open(self.sheet_path) as source:
+            for _, element in iterparse(source):
+                tag = element.tag
+                if tag == cell_tag:
+                    # The cell reference is optional; without it cells follow on
+                    reference = element.get("r")
+                    if reference is not None:
+                        letters = reference.rstrip("0123456789")
+                        column = column_indexes.get(letters)
+                        if column is None:
+                            column = column_indexes[letters] = column_index_from_string(letters) - 1
+                    if self.columns is None or column in self.columns:
+                        row.extend([None] * (column - len(row)))
+                        row.append(self.value(element))
+                    column += 1
+                elif tag == row_tag:
+                    yield row
+                    row = []
+                    column = 0
+                    element.clear()
+                elif tag == dimension_tag:
+                    last_row = element.get("ref", "").rsplit(":", 1)[-1].lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+                    self.row_count = int(last_row) if last_row.isdigit() else None
+
+    def close(self):
+        self.archive.close()
+
+class OpenpyxlRows:
+    # The same interface over openpyxl's read-only mode, for workbooks laid out
+    # in ways XlsxRows doesn't handle
+    def __init__(self, file_path):
+        self.workbook = load_workbook(file_path, read_only=True, data_only=True)
+        self.columns = None
+        self.row_count = self.workbook.active.max_row
+
+    def __iter__(self):
+        return self.workbook.active.iter_rows(values_only=True)
+
+    def close(self):
+        self.workbook.close()
+
+def open_rows(file_path):
+    try:
+        return XlsxRows(file_path)
+    except (zipfile.BadZipFile, UnsupportedWorkbook):
+        return OpenpyxlRows(file_path)
+
+def roster_columns(headers):
+    # Maps each NBEN902 column the roster provides to its index in the sheet
+    headers = [cell_text(header) for header in headers]
+    columns = {header: index for index, header in enumerate(headers) if header in COLUMN_NAMES}
+    if "Employee ID" not in columns and len(headers) > EMPLOYEE_ID_COLUMN_INDEX:
+        columns["Employee ID"] = EMPLOYEE_ID_COLUMN_INDEX
+    return columns
+
+def load_roster(file_path, tracker=None, chunk_size=CHUNK_SIZE):
+    # Streams the active sheet, keeping only the columns the 902 file uses,
+    # and builds the roster chunk by chunk. Safe to run on a worker thread;
+    # reports rows read to tracker. A workbook the fast reader stumbles on
+    # part way through is read again with openpyxl.
+    sheet = open_rows(file_path)
+    try:
+        return read_roster(sheet, tracker, chunk_size)
+    except MissingNameColumn:
+        raise
+    except Exception:
+        if not isinstance(sheet, XlsxRows):
+            raise
+    finally:
+        sheet.close()
+    sheet = OpenpyxlRows(file_path)
+    try:
+        return read_roster(sheet, tracker, chunk_size)
+    finally:
+        sheet.close()
+
+def read_roster(sheet, tracker, chunk_size):
+    rows = iter(sheet)
+    headers = next(rows, None)
+    if headers is None:
+        return Roster({})
+    columns = roster_columns(headers)
+    if "Name" not in columns:
+        raise MissingNameColumn("The member data file has no Name column.")
+    if tracker is not None:
+        tracker.start(max((sheet.row_count or 0) - 1, 0))
+
+    names = list(columns)
+    indexes = [columns[name] for name in names]
+    sheet.columns = set(indexes)
+    chunks = {name: [] for name in names}
+    pending = [[] for _ in names]
+    done = 0
+    for row in rows:
+        if not any(value is not None for value in row):
+            continue
+        for values, index in zip(pending, indexes):
+            values.append(cell_text(row[index]) if index < len(row) else "")
+        if len(pending[0]) == chunk_size:
+            for name, values in zip(names, pending):
+                chunks[name].append(np.array(values, dtype=str))
+            pending = [[] for _ in names]
+            done += chunk_size
+            if tracker is not None:
+                tracker.update(done)
+    for name, values in zip(names, pending):
+        chunks[name].append(np.array(values, dtype=str))
+    if tracker is not None:
+        tracker.update(done + len(pending[0]))
+    return Roster({name: np.concatenate(parts) for name, parts in chunks.items()})
@@ -0,0 +1,324 @@
+import hashlib
+import os
+import posixpath
+import socket
+import threading
+import time
+import paramiko
+
+SFTP_PORT = 22
+KEEPALIVE_INTERVAL = 30
+
+# OSC destination for NBEN902 files
+DEFAULT_HOST = "sft.osc.state.ny.us"
+DEFAULT_USERNAME = "sccea_paysr"
+DEFAULT_REMOTE_DIR = "/inbound/"
+REMOTE_FILE_NAME = "paysrp.nben902.sccea.input"
+
+# Upload tuning. 32 KB is the largest write request every SFTP server has to
+# accept; servers that take bigger requests (OpenSSH takes up to 256 KB) upload
+# faster with a larger request_size, see benchmarks/bench_sftp_upload.py. A
+# larger SSH window lets more data be in flight on high-latency links.
+REQUEST_SIZE = 32 * 1024
+READ_BUFFER_SIZE = 1024 * 1024
+WINDOW_SIZE = 16 * 1024 * 1024
+MAX_PACKET_SIZE = 256 * 1024
+
+# Uploads go to remote_path + PARTIAL_SUFFIX and are renamed once verified, so
+# an interrupted upload can be resumed and never looks like a complete file
+PARTIAL_SUFFIX = ".part"
+RESUME_CHECK_SIZE = 64 * 1024
+HASH_ALGORITHM = "sha256"
+
+# Errors that mean the connection dropped, even if the transport hasn't noticed yet
+CONNECTION_ERRORS = (EOFError, ConnectionError, socket.timeout, paramiko.SSHException)
+
+class UploadVerificationError(Exception):
+    pass
+
+class TransferCancelled(Exception):
+    pass
+
+class SFTPSession:
+    def __init__(self, host, port, username, password=None, pkey=None, window_size=WINDOW_SIZE, max_packet_size=MAX_PACKET_SIZE):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.pkey = pkey
+        self.window_size = window_size
+        self.max_packet_size = max_packet_size
+        self.transport = None
+        self.sftp = None
+        self.lock = threading.Lock()
+        # Held by a run() using self.sftp because the server refused it a channel of its own
+        self.shared_channel_lock = threading.Lock()
+
+    def is_active(self):
+        return (
+            self.transport is not None and self.transport.is_active() and self.transport.is_authenticated()
+            and self.sftp is not None and not self.sftp.sock.closed
+        )
+
+    def is_negotiated(self):
+        # Connected with keys exchanged, waiting to authenticate
+        return self.transport is not None and self.transport.is_active() and not self.transport.is_authenticated()
+
+    def negotiate(self):
+        # DNS lookup, TCP connect and key exchange: everything that doesn't need credentials
+        self.close()
+        self.transport = paramiko.Transport((self.host, self.port), default_window_size=self.window_size, default_max_packet_size=self.max_packet_size)
+        self.transport.start_client()
+
+    def authenticate(self):
+        if self.pkey is not None:
+            self.transport.auth_publickey(self.username, self.pkey)
+        else:
+            self.transport.auth_password(self.username, self.password)
+        self.transport.set_keepalive(KEEPALIVE_INTERVAL)
+        self.sftp = paramiko.SFTPClient.from_transport(self.transport)
+
+    def connect(self):
+        # Reuses a transport negotiated ahead of time if the server hasn't
+        # dropped it while it sat unauthenticated
+        if self.is_negotiated():
+            try:
+                self.authenticate()
+                return
+            except paramiko.AuthenticationException:
+                raise
+            except CONNECTION_ERRORS:
+                pass
+        self.negotiate()
+        self.authenticate()
+
+    def close(self):
+        if self.sftp is not None:
+            try:
+                self.sftp.close()
+            except CONNECTION_ERRORS:
+                # The connection is already gone
+                pass
+            self.sftp = None
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+def remote_file_path(remote_dir, file_name=REMOTE_FILE_NAME):
+    return posixpath.join(remote_dir, file_name)
+
+def load_private_key(key_path, passphrase=None):
+    return paramiko.PKey.from_path(os.path.expanduser(key_path), passphrase)
+
+def upload_file(sftp, local_path, remote_path, callback=None, request_size=REQUEST_SIZE, read_buffer_size=READ_BUFFER_SIZE, offset=0):
+    # Pipelined upload: write requests are sent without waiting for each
+    # acknowledgement, which are collected when the remote file is closed.
+    # callback(transferred, total) is called once per read buffer. With an
+    # offset, the first offset bytes are assumed to be on the server already.
+    file_size = os.path.getsize(local_path)
+    transferred = offset
+    with open(local_path, "rb") as local_file, sftp.open(remote_path, "r+b" if offset else "wb") as remote_file:
+        remote_file.MAX_REQUEST_SIZE = request_size
+        remote_file.set_pipelined(True)
+        if offset:
+            local_file.seek(offset)
+            remote_file.seek(offset)
+        while True:
+            data = local_file.read(read_buffer_size)
+            if not data:
+                break
+            remote_file.write(data)
+            transferred += len(data)
+            if callback is not None:
+                callback(transferred, file_size)
+    return transferred
+
+def file_digest(file_path, algorithm=HASH_ALGORITHM, chunk_size=READ_BUFFER_SIZE):
+    digest = hashlib.new(algorithm)
+    with open(file_path, "rb") as file:
+        for data in iter(lambda: file.read(chunk_size), b""):
+            digest.update(data)
+    return digest.hexdigest()
+
+def remote_digest(sftp, remote_path, algorithm=HASH_ALGORITHM, chunk_size=READ_BUFFER_SIZE):
+    digest = hashlib.new(algorithm)
+    with sftp.open(remote_path, "rb") as remote_file:
+        remote_file.prefetch()
+        for data in iter(lambda: remote_file.read(chunk_size), b""):
+            digest.update(data)
+    return digest.hexdigest()
+
+def resume_offset(sftp, local_path, partial_path):
+    # Returns how many bytes of a previous attempt can be kept, checking that
+    # the end of the partial upload matches the local file at that position
+    try:
+        offset = sftp.stat(partial_path).st_size
+    except IOError:
+        return 0
+    if not offset or offset > os.path.getsize(local_path):
+        return 0
+    check_size = min(offset, RESUME_CHECK_SIZE)
+    with open(local_path, "rb") as local_file, sftp.open(partial_path, "rb") as remote_file:
+        local_file.seek(offset - check_size)
+        remote_file.seek(offset - check_size)
+        if local_file.read(check_size) != remote_file.read(check_size):
+            return 0
+    return offset
+
+def replace_remote_file(sftp, source_path, target_path):
+    try:
+        sftp.posix_rename(source_path, target_path)
+        return
+    except IOError:
+        pass
+    # Servers without the posix-rename extension refuse to rename over a file
+    try:
+        sftp.remove(target_path)
+    except IOError:
+        pass
+    sftp.rename(source_path, target_path)
+
+def resumable_upload(sftp, local_path, remote_path, callback=None, verify=True, request_size=REQUEST_SIZE, read_buffer_size=READ_BUFFER_SIZE):
+    # Uploads to a partial file, continuing a previous attempt if there is one,
+    # checks the size and (with verify) the hash of what arrived, then renames
+    # it into place. Returns the hash of the local file.
+    partial_path = remote_path + PARTIAL_SUFFIX
+    offset = resume_offset(sftp, local_path, partial_path)
+    upload_file(sftp, local_path, partial_path, callback, request_size, read_buffer_size, offset)
+
+    local_digest = file_digest(local_path)
+    remote_size = sftp.stat(partial_path).st_size
+    if remote_size != os.path.getsize(local_path):
+        sftp.remove(partial_path)
+        raise UploadVerificationError(f"Uploaded file is {remote_size} bytes, expected {os.path.getsize(local_path)}")
+    if verify and remote_digest(sftp, partial_path) != local_digest:
+        sftp.remove(partial_path)
+        raise UploadVerificationError("Uploaded file does not match the local file")
+
+    replace_remote_file(sftp, partial_path, remote_path)
+    return local_digest
+
+# Keeps one authenticated transport per (host, port, username) open for the
+# life of the app, so repeated sends skip the TCP connect, key exchange and
+# authentication. Sessions that have dropped are reconnected on next use.
+class SFTPSessionManager:
+    def __init__(self, window_size=WINDOW_SIZE, max_packet_size=MAX_PACKET_SIZE):
+        self.window_size = window_size
+        self.max_packet_size = max_packet_size
+        self.lock = threading.Lock()
+        self.sessions = {}
+
+    def has_session(self, host, username, port=SFTP_PORT):
+        with self.lock:
+            session = self.sessions.get((host, port, username))
+            return session is not None and session.is_active()
+
+    def get_session(self, host, username, password=None, pkey=None, port=SFTP_PORT):
+        key = (host, port, username)
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = SFTPSession(host, port, username, window_size=self.window_size, max_packet_size=self.max_packet_size)
+                self.sessions[key] = session
+        if password or pkey:
+            if session.is_active() and (password, pkey) != (session.password, session.pkey):
+                session.close()
+            session.password = password
+            session.pkey = pkey
+        return session
+
+    def get_sftp(self, host, username, password=None, pkey=None, port=SFTP_PORT):
+        session = self.get_session(host, username, password, pkey, port)
+        with session.lock:
+            if not session.is_active():
+                if session.password is None and session.pkey is None:
+                    raise paramiko.AuthenticationException("No credentials for " + host)
+                session.connect()
+            return session.sftp
+
+    def prewarm(self, host, username, port=SFTP_PORT):
+        # Negotiates a transport for a later get_sftp(), so only authentication
+        # is left when credentials arrive. Blocks; call it from a worker thread.
+        # Errors are ignored here and surface again on the real connect.
+        session = self.get_session(host, username, port=port)
+        with session.lock:
+            if session.is_active() or session.is_negotiated():
+                return
+            try:
+                session.negotiate()
+            except Exception:
+                session.close()
+
+    def discard_prewarmed(self, host, username, port=SFTP_PORT):
+        # Closes a negotiated transport nobody authenticated, leaving live sessions alone
+        with self.lock:
+            session = self.sessions.get((host, port, username))
+        # A locked session is being connected or used; leave it to its owner
+        if session is not None and session.lock.acquire(blocking=False):
+            try:
+                if session.is_negotiated():
+                    session.close()
+            finally:
+                session.lock.release()
+
+    def run(self, host, username, operation, password=None, pkey=None, port=SFTP_PORT, retries=1, retry_delay=0, cancel_event=None, new_channel=False):
+        # Calls operation(sftp). If the connection drops (or can't be made), the
+        # session is reconnected and the operation retried up to retries times,
+        # waiting retry_delay, then twice that, and so on between attempts.
+        # With new_channel, operation gets its own SFTP channel on the shared
+        # transport, so several threads can transfer at once.
+        attempt = 0
+        while True:
+            transport = None
+            try:
+                sftp = self.get_sftp(host, username, password, pkey, port)
+                transport = sftp.get_channel().get_transport()
+                if not new_channel:
+                    return operation(sftp)
+                try:
+                    channel = paramiko.SFTPClient.from_transport(transport)
+                except paramiko.SSHException:
+                    # The server limits channels per connection (MaxSessions).
+                    # paramiko raises ChannelException for the refusal, or a
+                    # plain SSHException when threads open channels at once.
+                    # If the connection is still up, take turns on the
+                    # session's own channel rather than reconnecting.
+                    if not transport.is_active():
+                        raise
+                    channel = None
+                if channel is None:
+                    with self.get_session(host, username, port=port).shared_channel_lock:
+                        return operation(sftp)
+                with channel:
+                    return operation(channel)
+            except paramiko.AuthenticationException:
+                raise
+            except Exception as e:
+                # Only a dropped connection is worth retrying. A refused channel
+                # leaves the connection, and uploads on its other channels, up.
+                dropped = (
+                    (isinstance(e, CONNECTION_ERRORS) and not isinstance(e, paramiko.ChannelException))
+                    or not self.has_session(host, username, port)
+                )
+                if attempt >= retries or not dropped or (cancel_event is not None and cancel_event.is_set()):
+                    raise
+            self.invalidate(host, username, port, transport)
+            time.sleep(retry_delay * 2 ** attempt)
+            attempt += 1
+
+    def invalidate(self, host, username, port=SFTP_PORT, transport=None):
+        # With a transport, only closes the session if it still uses that one,
+        # so a thread that saw an old connection fail doesn't close a new one
+        with self.lock:
+            session = self.sessions.get((host, port, username))
+        if session is not None and (transport is None or session.transport is transport):
+            session.close()
+
+    def close_all(self):
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions = {}
+        for session in sessions:
+            session.close()
+
+session_manager = SFTPSessionManager()
@@ -1,7 +1,13 @@
-import paramiko
 import os
+import threading
 import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
+from tkinter import filedialog, messagebox, simpledialog, ttk
+from sftp_client import session_manager, remote_file_path, REMOTE_FILE_NAME, DEFAULT_HOST, DEFAULT_REMOTE_DIR, DEFAULT_USERNAME
+from progress import FRAME_INTERVAL_MS, describe_transfer, format_size
+from transmission_ledger import transmission_ledger, format_sent_at
+from transmission_queue import transmission_queue, CONNECTING, FAILED, SENDING, SENT, SKIPPED
+
+SHARED_NAMES_WARNING = "Several files are waiting to be sent under the same name; see Send."
 
 class SFTPTransmitter(tk.Toplevel):
     def __init__(self, parent, file_path, save_function):
@@ -9,86 +15,310 @@ class SFTPTransmitter(tk.Toplevel):
         self.file_path = file_path
         self.save_function = save_function
 
+        # Uploads run on the queue's worker threads; the dialog redraws the
+        # queue from their status and trackers at a fixed rate
+        self.queue = transmission_queue
+        self.queue.load()
+        self.poll_id = None
+        self.prewarmed = None
+        self.row_states = {}
+        self.run_sizes = {}
+
         self.title("SFTP Transmission")
-        self.geometry("500x450")
+        self.geometry("700x600")
 
         tk.Label(self, text="Destination Address:").pack(pady=5)
         self.host_entry = tk.Entry(self, width=50)
         self.host_entry.pack(pady=5)
-        self.host_entry.insert(0, "sft.osc.state.ny.us")
+        self.host_entry.insert(0, DEFAULT_HOST)
 
         tk.Label(self, text="Destination Folder:").pack(pady=5)
         self.remote_path_entry = tk.Entry(self, width=50)
         self.remote_path_entry.pack(pady=5)
-        self.remote_path_entry.insert(0, "/inbound/")
-
-        tk.Label(self, text="Current File Path:").pack(pady=5)
-        self.local_path_frame = tk.Frame(self)
-        self.local_path_frame.pack(pady=5)
-        self.local_path_entry = tk.Entry(self.local_path_frame, width=40)
-        self.local_path_entry.pack(side="left", pady=5)
-        self.local_path_entry.insert(0, file_path)
-        self.browse_button = tk.Button(self.local_path_frame, text="Browse", command=self.browse_file)
-        self.browse_button.pack(side="left", padx=5)
+        self.remote_path_entry.insert(0, DEFAULT_REMOTE_DIR)
 
         tk.Label(self, text="Username:").pack(pady=5)
         self.username_entry = tk.Entry(self, width=50)
         self.username_entry.pack(pady=5)
-        self.username_entry.insert(0, "sccea_paysr")
+        self.username_entry.insert(0, DEFAULT_USERNAME)
 
         tk.Label(self, text="Password:").pack(pady=5)
         self.password_entry = tk.Entry(self, show="*", width=50)
         self.password_entry.pack(pady=5)
 
+        tk.Label(self, text="Files to Send:").pack(pady=5)
+        self.queue_view = ttk.Treeview(self, columns=("file", "remote_name", "status", "progress"), show="headings", height=6)
+        for column, heading, width in (("file", "File", 200), ("remote_name", "Remote Name", 200), ("status", "Status", 80), ("progress", "Progress", 180)):
+            self.queue_view.heading(column, text=heading)
+            self.queue_view.column(column, width=width, stretch=column != "status")
+        self.queue_view.pack(fill="x", padx=10, pady=5)
+
+        self.queue_button_frame = tk.Frame(self)
+        self.queue_button_frame.pack(pady=5)
+        self.add_button = tk.Button(self.queue_button_frame, text="Add Files", command=self.add_files)
+        self.add_button.pack(side="left", padx=5)
+        self.remove_button = tk.Button(self.queue_button_frame, text="Remove", command=self.remove_selected)
+        self.remove_button.pack(side="left", padx=5)
+        self.rename_button = tk.Button(self.queue_button_frame, text="Remote Name...", command=self.rename_selected)
+        self.rename_button.pack(side="left", padx=5)
+        self.clear_button = tk.Button(self.queue_button_frame, text="Clear Sent", command=self.clear_sent)
+        self.clear_button.pack(side="left", padx=5)
+        self.history_button = tk.Button(self.queue_button_frame, text="History", command=lambda: TransmissionHistory(self))
+        self.history_button.pack(side="left", padx=5)
+
         self.progress = ttk.Progressbar(self, orient="horizontal", length=400, mode="determinate")
         self.progress.pack(pady=10)
 
-        self.transmit_button = tk.Button(self, text="Send", command=self.transmit_file)
-        self.transmit_button.pack(pady=20)
+        self.button_frame = tk.Frame(self)
+        self.button_frame.pack(pady=10)
+        self.transmit_button = tk.Button(self.button_frame, text="Send", command=self.transmit_file)
+        self.transmit_button.pack(side="left", padx=5)
+        self.cancel_button = tk.Button(self.button_frame, text="Cancel", command=self.cancel_transfer, state="disabled")
+        self.cancel_button.pack(side="left", padx=5)
 
         self.status_label = tk.Label(self, text="")
         self.status_label.pack(pady=5)
 
-    def browse_file(self):
-        file_path = filedialog.askopenfilename(defaultextension=".input", filetypes=[("Input files", "*.input"), ("All files", "*.*")])
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # The file being edited goes to the name OSC expects
         if file_path:
-            self.local_path_entry.delete(0, tk.END)
-            self.local_path_entry.insert(0, file_path)
+            self.queue.add(file_path, REMOTE_FILE_NAME)
+        self.refresh_queue()
+        if self.queue.is_running():
+            self.start_polling()
+        else:
+            self.show_shared_names()
+
+        # Connect and exchange keys while the user types the password
+        self.host_entry.bind("<FocusOut>", self.prewarm)
+        self.username_entry.bind("<FocusOut>", self.prewarm)
+        self.prewarm()
+
+    def prewarm(self, event=None):
+        target = (self.host_entry.get().strip(), self.username_entry.get().strip())
+        if not all(target) or target == self.prewarmed:
+            return
+        if self.prewarmed is not None and not self.queue.is_running():
+            session_manager.discard_prewarmed(*self.prewarmed)
+        self.prewarmed = target
+        threading.Thread(target=session_manager.prewarm, args=target, daemon=True).start()
+
+    def show_shared_names(self):
+        # Flags files waiting to go to the same remote name as soon as the
+        # queue shows them, and clears the warning once that's resolved
+        if self.queue.shared_remote_names():
+            self.status_label.config(text=SHARED_NAMES_WARNING, fg="red")
+        elif self.status_label.cget("text") == SHARED_NAMES_WARNING:
+            self.status_label.config(text="", fg="black")
+
+    def add_files(self):
+        file_paths = filedialog.askopenfilenames(filetypes=[("Input files", "*.input"), ("All files", "*.*")])
+        for file_path in file_paths:
+            self.queue.add(file_path, os.path.basename(file_path))
+        self.refresh_queue()
+        self.show_shared_names()
+
+    def selected_jobs(self):
+        return [job for job in (self.queue.find(int(item)) for item in self.queue_view.selection()) if job is not None]
+
+    def remove_selected(self):
+        for job in self.selected_jobs():
+            self.queue.remove(job.job_id)
+        self.refresh_queue()
+        self.show_shared_names()
+
+    def rename_selected(self):
+        jobs = self.selected_jobs()
+        if len(jobs) != 1:
+            messagebox.showinfo("Remote Name", "Select one file to rename.", parent=self)
+            return
+        remote_name = simpledialog.askstring("Remote Name", "Upload this file as:", initialvalue=jobs[0].remote_name, parent=self)
+        if remote_name and remote_name.strip():
+            self.queue.set_remote_name(jobs[0].job_id, remote_name.strip())
+        self.refresh_queue()
+        self.show_shared_names()
+
+    def clear_sent(self):
+        self.queue.clear_sent()
+        self.refresh_queue()
 
     def transmit_file(self):
-        host = self.host_entry.get()
+        host = self.host_entry.get().strip()
         remote_path = self.remote_path_entry.get()
-        local_path = self.local_path_entry.get()
-        username = self.username_entry.get()
+        username = self.username_entry.get().strip()
         password = self.password_entry.get()
 
-        if not password:
+        # An open session from an earlier send doesn't need the password again
+        if not password and not session_manager.has_session(host, username):
             messagebox.showerror("Error", "Password is required for SFTP transmission.")
             return
+        if self.queue.is_running():
+            return
+        waiting = [job for job in self.queue.snapshot() if job.status not in (SENT, SKIPPED)]
+        missing = [job.local_path for job in waiting if not os.path.isfile(job.local_path)]
+        if missing:
+            messagebox.showerror("Error", "These files no longer exist:\n" + "\n".join(missing))
+            return
+        if not self.check_shared_names():
+            return
+        if not self.check_resends(waiting, host, remote_path):
+            return
+
+        self.run_sizes = {job.job_id: os.path.getsize(job.local_path) for job in self.queue.snapshot() if job.status not in (SENT, SKIPPED)}
+        count = self.queue.start(host, username, password=password or None, remote_dir=remote_path)
+        if not count:
+            self.status_label.config(text="Nothing to send.", fg="black")
+            return
+        self.status_label.config(text=f"Sending {count} file(s) to {host}...", fg="black")
+        self.start_polling()
+
+    def check_shared_names(self):
+        # Each send replaces the last at the remote path, and OSC may pick up
+        # any of them, so only one waiting file may go to each name
+        shared = self.queue.shared_remote_names()
+        if not shared:
+            return True
+        lines = []
+        for remote_name, jobs in shared.items():
+            lines.append(f"{remote_name}:")
+            lines.extend(f"    {os.path.basename(job.local_path)} ({job.status})" for job in jobs)
+        messagebox.showerror(
+            "Same Remote Name",
+            "These files would all be sent under the same name:\n\n" + "\n".join(lines)
+            + "\n\nRemove all but one of them, or give them different names with Remote Name...",
+            parent=self,
+        )
+        return False
+
+    def check_resends(self, jobs, host, remote_dir):
+        # Files whose exact content already went to the same place are skipped
+        # or sent again as the user chooses. Returns False to cancel the send.
+        resends = []
+        for job in jobs:
+            digest, _ = transmission_ledger.fingerprint(job.local_path)
+            entry = transmission_ledger.find(digest, host, remote_file_path(remote_dir, job.remote_name))
+            if entry is not None:
+                resends.append((job, entry))
+        if not resends:
+            return True
 
-        try:
-            transport = paramiko.Transport((host, 22))
-            transport.connect(username=username, password=password)
+        lines = [f"{os.path.basename(job.local_path)} was sent as {entry['remote_path']} on {format_sent_at(entry)}" for job, entry in resends]
+        response = messagebox.askyesnocancel(
+            "Already Sent",
+            "These files are identical to ones already transmitted:\n\n" + "\n".join(lines) + "\n\nSend them again? Choose No to skip them.",
+            parent=self,
+        )
+        if response is None:
+            return False
+        if not response:
+            for job, entry in resends:
+                self.queue.skip(job.job_id)
+            self.refresh_queue()
+        return True
 
-            sftp = paramiko.SFTPClient.from_transport(transport)
-            file_size = os.path.getsize(local_path)
+    def start_polling(self):
+        self.transmit_button.config(state="disabled")
+        self.cancel_button.config(state="normal")
+        self.rename_button.config(state="disabled")
+        self.poll_id = self.after(FRAME_INTERVAL_MS, self.poll_transfer)
 
-            self.progress["maximum"] = file_size
-            self.progress["value"] = 0
+    def poll_transfer(self):
+        self.refresh_queue()
+        if self.queue.is_running():
+            self.poll_id = self.after(FRAME_INTERVAL_MS, self.poll_transfer)
+            return
+
+        self.poll_id = None
+        self.transmit_button.config(state="normal")
+        self.cancel_button.config(state="disabled")
+        self.rename_button.config(state="normal")
+        # Files added during the send weren't part of it; they wait for the next Send
+        jobs = [job for job in self.queue.snapshot() if job.job_id in self.queue.run_job_ids]
+        failed = sum(job.status == FAILED for job in jobs)
+        waiting = sum(job.status not in (SENT, SKIPPED) for job in jobs)
+        if failed:
+            self.status_label.config(text=f"{failed} file(s) failed to transmit.", fg="red")
+        elif waiting:
+            self.status_label.config(text="Transmission cancelled.", fg="red")
+        else:
+            self.status_label.config(text="All files transmitted successfully.", fg="green")
+        self.show_shared_names()
+
+    def refresh_queue(self):
+        # Only rows whose text changed are updated, so an idle queue costs nothing
+        jobs = self.queue.snapshot()
+        items = {str(job.job_id) for job in jobs}
+        for item in self.queue_view.get_children():
+            if item not in items:
+                self.queue_view.delete(item)
+                self.row_states.pop(item, None)
+
+        done = 0
+        for index, job in enumerate(jobs):
+            item = str(job.job_id)
+            snapshot = job.tracker.snapshot()
+            if job.status == SENDING:
+                if snapshot.total and snapshot.done >= snapshot.total:
+                    progress = "Verifying..."
+                else:
+                    progress = describe_transfer(snapshot)
+                done += snapshot.done if job.job_id in self.run_sizes else 0
+            elif job.status == FAILED:
+                progress = job.error
+            elif job.status == CONNECTING:
+                progress = "Connecting..."
+            else:
+                progress = ""
+            if job.status == SENT and job.job_id in self.run_sizes:
+                done += self.run_sizes[job.job_id]
+            values = (os.path.basename(job.local_path), job.remote_name, job.status, progress)
+            if item not in self.row_states:
+                self.queue_view.insert("", index, iid=item, values=values)
+            elif self.row_states[item] != values:
+                self.queue_view.item(item, values=values)
+            self.row_states[item] = values
 
-            def progress_callback(transferred, total):
-                self.progress["value"] = transferred
-                self.update_idletasks()
+        # The bar covers every file in the current send
+        self.progress["maximum"] = max(sum(self.run_sizes.values()), 1)
+        self.progress["value"] = done
 
-            remote_file_path = os.path.join(remote_path, "paysrp.nben902.sccea.input")
-            sftp.put(local_path, remote_file_path, callback=progress_callback)
+    def cancel_transfer(self):
+        if not self.queue.is_running():
+            return
+        self.queue.cancel()
+        self.status_label.config(text="Cancelling...", fg="black")
+
+    def on_close(self):
+        self.cancel_transfer()
+        if self.poll_id is not None:
+            self.after_cancel(self.poll_id)
+        if self.prewarmed is not None:
+            session_manager.discard_prewarmed(*self.prewarmed)
+        self.destroy()
+
+class TransmissionHistory(tk.Toplevel):
+    # Past transmissions from the local ledger, newest first
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Transmission History")
+        self.geometry("800x400")
 
-            sftp.close()
-            transport.close()
+        columns = (("sent_at", "Sent", 120), ("file", "File", 160), ("remote_path", "Sent As", 220), ("host", "Host", 140), ("size", "Size", 70), ("sha256", "SHA-256", 90))
+        self.history_view = ttk.Treeview(self, columns=[column for column, _, _ in columns], show="headings")
+        for column, heading, width in columns:
+            self.history_view.heading(column, text=heading)
+            self.history_view.column(column, width=width)
+        scrollbar = tk.Scrollbar(self, orient="vertical", command=self.history_view.yview)
+        self.history_view.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.history_view.pack(fill="both", expand=True, padx=10, pady=10)
 
-            self.status_label.config(text="File transmitted successfully.", fg="green")
-        except Exception as e:
-            self.status_label.config(text=f"Failed to transmit file: {e}", fg="red")
+        for entry in transmission_ledger.history():
+            self.history_view.insert("", "end", values=(
+                format_sent_at(entry), os.path.basename(entry["local_path"]), entry["remote_path"],
+                entry["host"], format_size(entry["size"]), entry["sha256"][:12],
+            ))
 
 def save_before_transmit(file_path, save_function):
     if not file_path:
@@ -96,5 +326,9 @@ def save_before_transmit(file_path, save_function):
         if not file_path:
             return None
 
-    save_function(file_path)
+    # Always saved, so what is sent has been validated and normalized, even if
+    # the table wasn't edited; the save leaves a file that already matches alone
+    if not save_function(file_path):
+        # Validation failed or the save was cancelled; the file on disk is stale
+        return None
     return file_path
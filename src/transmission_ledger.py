@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+import time
+
+from app_paths import app_data_path
+from sftp_client import file_digest
+
+LEDGER_FILE_NAME = "transmissions.jsonl"
+
+# Every successful transmission, one JSON object per line: what was sent (hash,
+# size, local path and modification time), where to, and when. Lines are only
+# ever appended, so a crash can at worst lose the last one.
+class TransmissionLedger:
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = None
+
+    def load(self):
+        with self.lock:
+            if self.entries is not None:
+                return
+            if self.path is None:
+                self.path = app_data_path(LEDGER_FILE_NAME)
+            self.entries = []
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        self.entries.append(json.loads(line))
+                    except ValueError:
+                        # A line cut short by a crash
+                        continue
+
+    def fingerprint(self, local_path):
+        # Returns (digest, size). A file whose path, size and modification
+        # time match an earlier transmission isn't hashed again.
+        self.load()
+        local_path = os.path.abspath(local_path)
+        stat = os.stat(local_path)
+        with self.lock:
+            for entry in reversed(self.entries):
+                if (entry["local_path"], entry["size"], entry["mtime_ns"]) == (local_path, stat.st_size, stat.st_mtime_ns):
+                    return entry["sha256"], stat.st_size
+        return file_digest(local_path), stat.st_size
+
+    def find(self, digest, host, remote_path):
+        # The last time this content was sent to this destination, or None
+        self.load()
+        with self.lock:
+            for entry in reversed(self.entries):
+                if (entry["sha256"], entry["host"], entry["remote_path"]) == (digest, host, remote_path):
+                    return entry
+        return None
+
+    def record(self, local_path, digest, host, username, remote_path):
+        self.load()
+        local_path = os.path.abspath(local_path)
+        stat = os.stat(local_path)
+        entry = {
+            "sent_at": time.time(), "host": host, "username": username, "remote_path": remote_path,
+            "local_path": local_path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest,
+        }
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(entry) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            self.entries.append(entry)
+        return entry
+
+    def history(self, limit=None):
+        # Newest first
+        self.load()
+        with self.lock:
+            entries = self.entries[::-1]
+        return entries[:limit] if limit else entries
+
+def format_sent_at(entry):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["sent_at"]))
+
+transmission_ledger = TransmissionLedger()
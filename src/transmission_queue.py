@@ -0,0 +1,267 @@
+import json
+import os
+import threading
+import time
+
+from app_paths import app_data_path
+from file_operations import write_file_atomic
+from progress import ProgressTracker
+from transmission_ledger import transmission_ledger
+from sftp_client import DEFAULT_REMOTE_DIR, SFTP_PORT, TransferCancelled, remote_file_path, resumable_upload, session_manager
+
+QUEUE_FILE_NAME = "transmission_queue.json"
+
+# Uploads run on this many SFTP channels of one SSH connection at a time.
+# OpenSSH allows 10 sessions per connection by default.
+MAX_CHANNELS = 3
+
+PENDING = "Pending"
+CONNECTING = "Connecting"
+SENDING = "Sending"
+SENT = "Sent"
+SKIPPED = "Already sent"
+FAILED = "Failed"
+CANCELLED = "Cancelled"
+
+class QueuedFile:
+    def __init__(self, job_id, local_path, remote_name, status=PENDING, error="", digest="", updated=None):
+        self.job_id = job_id
+        self.local_path = local_path
+        self.remote_name = remote_name
+        self.status = status
+        self.error = error
+        self.digest = digest
+        self.updated = updated or time.time()
+        self.tracker = ProgressTracker()
+
+    def to_dict(self):
+        return {
+            "local_path": self.local_path, "remote_name": self.remote_name, "status": self.status,
+            "error": self.error, "digest": self.digest, "updated": self.updated,
+        }
+
+# Files waiting to be sent, and what happened to the ones that were. The queue
+# is saved after every change, so it survives a restart; anything that was
+# mid-upload goes back to pending and resumes from the partial remote file.
+class TransmissionQueue:
+    def __init__(self, path=None, max_channels=MAX_CHANNELS, ledger=None):
+        self.path = path
+        self.max_channels = max_channels
+        # Successful sends are recorded here when given
+        self.ledger = ledger
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.jobs = []
+        self.next_id = 1
+        self.loaded = False
+        self.cancel_event = threading.Event()
+        self.workers = []
+        self.active_remote_names = set()
+        # The jobs the current (or last) start() sends; files queued while it
+        # runs wait for the next one, which checks them for re-sends and names
+        self.run_job_ids = set()
+        self.target = None
+
+    def load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        if self.path is None:
+            self.path = app_data_path(QUEUE_FILE_NAME)
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as file:
+            entries = json.load(file)
+        with self.lock:
+            for entry in entries:
+                job = QueuedFile(self.next_id, **entry)
+                if job.status in (CONNECTING, SENDING):
+                    job.status = PENDING
+                self.jobs.append(job)
+                self.next_id += 1
+
+    def save(self):
+        # Workers finish at the same time; the save lock keeps an older state
+        # from being written over a newer one
+        if self.path is None:
+            return
+        with self.save_lock:
+            with self.lock:
+                data = json.dumps([job.to_dict() for job in self.jobs], indent=1)
+            write_file_atomic(self.path, data.encode("utf-8"))
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.jobs)
+
+    def find(self, job_id):
+        with self.lock:
+            for job in self.jobs:
+                if job.job_id == job_id:
+                    return job
+        return None
+
+    def add(self, local_path, remote_name):
+        # A file already waiting to go to the same place isn't queued twice. A
+        # skipped one is queued again; the re-send check asks about it anew.
+        local_path = os.path.abspath(local_path)
+        with self.lock:
+            for job in self.jobs:
+                if (job.local_path, job.remote_name) == (local_path, remote_name) and job.status != SENT:
+                    if job.status == SKIPPED:
+                        job.status = PENDING
+                        job.error = ""
+                        job.updated = time.time()
+                        break
+                    return job
+            else:
+                job = QueuedFile(self.next_id, local_path, remote_name)
+                self.next_id += 1
+                self.jobs.append(job)
+        self.save()
+        return job
+
+    def remove(self, job_id):
+        with self.lock:
+            self.jobs = [job for job in self.jobs if job.job_id != job_id or job.status in (CONNECTING, SENDING)]
+        self.save()
+
+    def set_remote_name(self, job_id, remote_name):
+        # A file in a send under way keeps the name that send was checked with
+        job = self.find(job_id)
+        if job is None or job.status in (CONNECTING, SENDING) or (job_id in self.run_job_ids and self.is_running()):
+            return
+        job.remote_name = remote_name
+        self.save()
+
+    def skip(self, job_id):
+        # Leaves a file out of sends without removing it, e.g. an identical re-send
+        job = self.find(job_id)
+        if job is None or job.status in (CONNECTING, SENDING):
+            return
+        job.status = SKIPPED
+        job.updated = time.time()
+        self.save()
+
+    def clear_sent(self):
+        with self.lock:
+            self.jobs = [job for job in self.jobs if job.status not in (SENT, SKIPPED)]
+        self.save()
+
+    def shared_remote_names(self):
+        # Remote names more than one waiting file would be sent as, each with
+        # those files. They'd go one after another, so the receiving end could
+        # pick up any of them; e.g. a failed send restored from an earlier run
+        # alongside the current file, both as REMOTE_FILE_NAME.
+        names = {}
+        with self.lock:
+            for job in self.jobs:
+                if job.status not in (SENT, SKIPPED):
+                    names.setdefault(job.remote_name, []).append(job)
+        return {name: jobs for name, jobs in names.items() if len(jobs) > 1}
+
+    def is_running(self):
+        return any(worker.is_alive() for worker in self.workers)
+
+    def start(self, host, username, password=None, pkey=None, port=SFTP_PORT, remote_dir=DEFAULT_REMOTE_DIR, retries=3, retry_delay=1):
+        # Sends every file not sent or skipped yet into remote_dir, up to
+        # max_channels at a time. Returns the number of files queued for
+        # sending. Raises ValueError if two of them share a remote name.
+        if self.is_running():
+            return 0
+        shared = self.shared_remote_names()
+        if shared:
+            raise ValueError(f"{len(next(iter(shared.values())))} files are waiting to be sent as {next(iter(shared))}")
+        self.cancel_event.clear()
+        with self.lock:
+            waiting = [job for job in self.jobs if job.status not in (SENT, SKIPPED)]
+            for job in waiting:
+                job.status = PENDING
+                job.error = ""
+                job.tracker.start(0)
+            self.run_job_ids = {job.job_id for job in waiting}
+        if not waiting:
+            return 0
+        self.save()
+
+        self.target = (host, username, port)
+        self.workers = [
+            threading.Thread(target=self.send_files, args=(host, username, password, pkey, port, remote_dir, retries, retry_delay), daemon=True)
+            for _ in range(min(self.max_channels, len(waiting)))
+        ]
+        for worker in self.workers:
+            worker.start()
+        return len(waiting)
+
+    def cancel(self):
+        self.cancel_event.set()
+        # Closing the connection interrupts a connect or handshake in progress;
+        # uploads stop at their next progress callback
+        with self.lock:
+            connecting = any(job.status == CONNECTING for job in self.jobs)
+        if connecting and self.target is not None:
+            session_manager.invalidate(*self.target)
+
+    def next_job(self):
+        # Two files going to the same remote path are never sent at the same
+        # time, or the second would overwrite the first's partial upload
+        with self.lock:
+            for job in self.jobs:
+                if job.status == PENDING and job.job_id in self.run_job_ids and job.remote_name not in self.active_remote_names:
+                    job.status = CONNECTING
+                    self.active_remote_names.add(job.remote_name)
+                    return job
+        return None
+
+    def finish_job(self, job, status, error="", digest=""):
+        with self.lock:
+            job.status = status
+            job.error = error
+            job.digest = digest or job.digest
+            job.updated = time.time()
+            self.active_remote_names.discard(job.remote_name)
+        self.save()
+
+    def send_files(self, host, username, password, pkey, port, remote_dir, retries, retry_delay):
+        # Runs on a worker thread until nothing it can send is left
+        while not self.cancel_event.is_set():
+            job = self.next_job()
+            if job is None:
+                return
+            self.send_file(job, host, username, password, pkey, port, remote_dir, retries, retry_delay)
+
+    def send_file(self, job, host, username, password, pkey, port, remote_dir, retries, retry_delay):
+        remote_path = remote_file_path(remote_dir, job.remote_name)
+
+        def progress_callback(transferred, total):
+            if self.cancel_event.is_set():
+                raise TransferCancelled()
+            job.tracker.update(transferred, total)
+
+        def upload(sftp):
+            if self.cancel_event.is_set():
+                raise TransferCancelled()
+            job.status = SENDING
+            job.tracker.start(os.path.getsize(job.local_path))
+            return resumable_upload(sftp, job.local_path, remote_path, callback=progress_callback)
+
+        try:
+            digest = session_manager.run(
+                host, username, upload, password=password, pkey=pkey, port=port,
+                retries=retries, retry_delay=retry_delay, cancel_event=self.cancel_event, new_channel=True,
+            )
+        except Exception as e:
+            if self.cancel_event.is_set():
+                self.finish_job(job, CANCELLED)
+            else:
+                self.finish_job(job, FAILED, str(e) or type(e).__name__)
+            return
+        self.finish_job(job, SENT, digest=digest)
+        if self.ledger is not None:
+            try:
+                self.ledger.record(job.local_path, digest, host, username, remote_path)
+            except OSError:
+                # The file did arrive; without its entry a re-send just isn't flagged
+                pass
+
+transmission_queue = TransmissionQueue(ledger=transmission_ledger)
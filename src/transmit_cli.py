@@ -0,0 +1,137 @@
+# Headless NBEN902 transmission, for running from cron or Task Scheduler at
+# payroll cutoff. Validates each file and sends it over SFTP using a key or a
+# credentials file, retrying with backoff if the connection drops. Files
+# identical to ones already sent to the same place are skipped unless --force
+# is given. Does not import tkinter.
+#
+#   python transmit_cli.py paysrp.nben902.sccea.input --key-file ~/.ssh/id_rsa
+#   python transmit_cli.py 05527.input 05007.input --keep-names --credentials ~/.nben902/sftp.ini
+import argparse
+import configparser
+import logging
+import os
+import sys
+
+from file_operations import COLUMN_NAMES, read_columns
+from sftp_client import (
+    DEFAULT_HOST, DEFAULT_REMOTE_DIR, DEFAULT_USERNAME, REMOTE_FILE_NAME, SFTP_PORT,
+    load_private_key, remote_file_path, resumable_upload, session_manager,
+)
+from transmission_ledger import format_sent_at, transmission_ledger
+from validation import format_errors, validate_columns
+
+PASSWORD_ENVIRONMENT_VARIABLE = "NBEN902_SFTP_PASSWORD"
+
+logger = logging.getLogger("transmit_902")
+
+def read_credentials(credentials_path):
+    # INI file with an [sftp] section: host, port, username, password,
+    # key_file, key_passphrase and remote_dir are all optional
+    config = configparser.ConfigParser()
+    if not config.read(os.path.expanduser(credentials_path)):
+        raise ValueError(f"Cannot read credentials file {credentials_path}")
+    if not config.has_section("sftp"):
+        raise ValueError(f"{credentials_path} has no [sftp] section")
+    return dict(config.items("sftp"))
+
+def validate_file(file_path):
+    columns = read_columns(file_path)
+    if not columns[0]:
+        return [f"{file_path} has no records."]
+    errors = validate_columns(dict(zip(COLUMN_NAMES, columns)))
+    return format_errors(errors).splitlines() if errors else []
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Validate and transmit NBEN902 files over SFTP without the GUI.")
+    parser.add_argument("files", nargs="+", help="NBEN902 files to send, in order")
+    parser.add_argument("--credentials", help="INI file with an [sftp] section (host, port, username, password, key_file, key_passphrase, remote_dir)")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--username")
+    parser.add_argument("--key-file", help="private key for key-based authentication")
+    parser.add_argument("--remote-dir")
+    parser.add_argument("--remote-name", default=REMOTE_FILE_NAME, help=f"name to upload the file as (default: {REMOTE_FILE_NAME}); with several files use --keep-names")
+    parser.add_argument("--keep-names", action="store_true", help="upload each file under its own file name")
+    parser.add_argument("--retries", type=int, default=5, help="reconnect attempts per file after a dropped connection")
+    parser.add_argument("--retry-delay", type=float, default=10, help="seconds before the first retry; doubles after each one")
+    parser.add_argument("--no-verify", action="store_true", help="only check the size of the upload, not its hash")
+    parser.add_argument("--skip-validation", action="store_true", help="send files even if they fail validation")
+    parser.add_argument("--force", action="store_true", help="send files even if identical content was already sent to the same place")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    try:
+        settings = read_credentials(args.credentials) if args.credentials else {}
+        host = args.host or settings.get("host", DEFAULT_HOST)
+        port = args.port or int(settings.get("port", SFTP_PORT))
+        username = args.username or settings.get("username", DEFAULT_USERNAME)
+        remote_dir = args.remote_dir or settings.get("remote_dir", DEFAULT_REMOTE_DIR)
+        key_file = args.key_file or settings.get("key_file")
+        pkey = load_private_key(key_file, settings.get("key_passphrase")) if key_file else None
+        password = settings.get("password") or os.environ.get(PASSWORD_ENVIRONMENT_VARIABLE)
+    except Exception as e:
+        logger.error("%s", e)
+        return 2
+    # Each upload replaces whatever is at its remote path, so two files sent
+    # to the same path would leave only the last one there
+    remote_paths = {}
+    for file_path in args.files:
+        remote_path = remote_file_path(remote_dir, os.path.basename(file_path) if args.keep_names else args.remote_name)
+        if remote_path in remote_paths:
+            hint = "" if args.keep_names else " (use --keep-names to send each under its own name)"
+            logger.error("%s and %s would both be sent as %s%s", remote_paths[remote_path], file_path, remote_path, hint)
+            return 2
+        remote_paths[remote_path] = file_path
+    if pkey is None and not password:
+        logger.error("No key file or password given (use --key-file, --credentials or %s)", PASSWORD_ENVIRONMENT_VARIABLE)
+        return 2
+
+    failures = 0
+    try:
+        for file_path in args.files:
+            if not os.path.isfile(file_path):
+                logger.error("%s: file not found", file_path)
+                failures += 1
+                continue
+            if not args.skip_validation:
+                errors = validate_file(file_path)
+                if errors:
+                    logger.error("%s: not sent, failed validation:\n%s", file_path, "\n".join(errors))
+                    failures += 1
+                    continue
+
+            remote_path = remote_file_path(remote_dir, os.path.basename(file_path) if args.keep_names else args.remote_name)
+            if not args.force:
+                digest, _ = transmission_ledger.fingerprint(file_path)
+                entry = transmission_ledger.find(digest, host, remote_path)
+                if entry is not None:
+                    logger.warning("%s: not sent, identical content went to %s:%s on %s (use --force to send anyway)", file_path, host, remote_path, format_sent_at(entry))
+                    continue
+
+            logger.info("%s: sending to %s:%s", file_path, host, remote_path)
+            try:
+                digest = session_manager.run(
+                    host, username,
+                    lambda sftp: resumable_upload(sftp, file_path, remote_path, verify=not args.no_verify),
+                    password=password, pkey=pkey, port=port,
+                    retries=args.retries, retry_delay=args.retry_delay,
+                )
+            except Exception as e:
+                logger.error("%s: transmission failed: %s", file_path, e)
+                failures += 1
+                continue
+            logger.info("%s: sent (sha256 %s)", file_path, digest)
+            try:
+                transmission_ledger.record(file_path, digest, host, username, remote_path)
+            except OSError as e:
+                logger.warning("%s: could not record the transmission: %s", file_path, e)
+    finally:
+        session_manager.close_all()
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
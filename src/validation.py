@@ -0,0 +1,115 @@
+import numpy as np
+from file_operations import encode_column
+
+# Validation works on whole columns of fixed-width byte strings (the format
+# RecordStore keeps them in): each column is viewed as an (n, width) matrix of
+# bytes and checked with NumPy masks, so no value is decoded or regex-matched.
+
+DIGITS = np.frombuffer(b"0123456789", dtype=np.uint8)
+DASH = ord("-")
+DOT = ord(".")
+DAYS_IN_MONTH = np.array([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+def as_byte_matrix(values, width):
+    values = encode_column(values)
+    width = max(width, values.dtype.itemsize)
+    values = values.astype(f"S{width}")
+    return values.view(np.uint8).reshape(len(values), width)
+
+def is_digit(matrix):
+    return (matrix >= DIGITS[0]) & (matrix <= DIGITS[-1])
+
+def digits_value(matrix):
+    value = np.zeros(len(matrix), dtype=np.int64)
+    for col in range(matrix.shape[1]):
+        value = value * 10 + (matrix[:, col].astype(np.int64) - DIGITS[0])
+    return value
+
+def check_required(values):
+    matrix = as_byte_matrix(values, 1)
+    return [(matrix[:, 0] == 0, "is required")]
+
+def check_employee_id(values):
+    matrix = as_byte_matrix(values, 9)
+    valid = (matrix[:, 0] == ord("N")) & is_digit(matrix[:, 1:9]).all(axis=1) & (matrix[:, 9:] == 0).all(axis=1)
+    return [(~valid, "must be N followed by 8 digits")]
+
+def check_date(values):
+    matrix = as_byte_matrix(values, 10)
+    blank = matrix[:, 0] == 0
+    well_formed = (
+        is_digit(matrix[:, [0, 1, 3, 4, 6, 7, 8, 9]]).all(axis=1)
+        & (matrix[:, 2] == DASH) & (matrix[:, 5] == DASH)
+        & (matrix[:, 10:] == 0).all(axis=1)
+    )
+
+    # MM-DD-YYYY
+    month = digits_value(matrix[:, 0:2])
+    day = digits_value(matrix[:, 3:5])
+    year = digits_value(matrix[:, 6:10])
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    valid_month = (month >= 1) & (month <= 12)
+    max_day = DAYS_IN_MONTH[np.where(valid_month, month, 0)] - ((month == 2) & ~leap)
+    valid_date = valid_month & (day >= 1) & (day <= max_day)
+
+    return [
+        (~blank & ~well_formed, "must be in MM-DD-YYYY format"),
+        (~blank & well_formed & ~valid_date, "is not a valid date"),
+    ]
+
+def check_amount(values):
+    matrix = as_byte_matrix(values, 1)
+    padding = matrix == 0
+    digits = is_digit(matrix)
+    dots = matrix == DOT
+    numeric = (
+        (digits | dots | padding).all(axis=1)
+        & (dots.sum(axis=1) <= 1)
+        & digits.any(axis=1)
+        # padding may only trail the value
+        & ~(np.maximum.accumulate(padding, axis=1) & ~padding).any(axis=1)
+    )
+    positive = (digits & (matrix != DIGITS[0])).any(axis=1)
+    return [
+        (~numeric, "must be a number"),
+        (numeric & ~positive, "must be greater than zero"),
+    ]
+
+COLUMN_CHECKS = {
+    "Agency Code": check_required,
+    "Name": check_required,
+    "Employee ID": check_employee_id,
+    "Deduction Code": check_required,
+    "Effective Date": check_date,
+    "Deduction End Date": check_date,
+    "Deduction Amount": check_amount,
+}
+
+def validate_columns(columns):
+    # columns maps column name to an array of values in row order. Returns every
+    # problem as a (row, column name, reason) tuple, ordered by row then column.
+    rows = []
+    column_positions = []
+    reasons = []
+    for col, (column_name, values) in enumerate(columns.items()):
+        check = COLUMN_CHECKS.get(column_name)
+        if check is None or len(values) == 0:
+            continue
+        for mask, reason in check(values):
+            failed = np.flatnonzero(mask)
+            rows.append(failed)
+            column_positions.append(np.full(len(failed), col))
+            reasons.extend([(column_name, reason)] * len(failed))
+
+    if not reasons:
+        return []
+    rows = np.concatenate(rows)
+    column_positions = np.concatenate(column_positions)
+    order = np.lexsort((column_positions, rows))
+    return [(int(rows[i]), reasons[i][0], reasons[i][1]) for i in order]
+
+def format_errors(errors, limit=20):
+    lines = [f"Row {row + 1}: {column_name} {reason}." for row, column_name, reason in errors[:limit]]
+    if len(errors) > limit:
+        lines.append(f"... and {len(errors) - limit} more.")
+    return "\n".join(lines)